@@ -4,7 +4,7 @@ import os
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -30,6 +30,63 @@ def _parse_header(value: Optional[str]) -> Optional[int]:
         ) from exc
 
 
+def _parse_positive_int(name: str, value: Optional[str], default: int) -> int:
+    if value is None or not value.strip():
+        return default
+    try:
+        parsed = int(value.strip())
+    except ValueError as exc:
+        raise ValueError(f"{name} debe ser un entero, se recibió '{value}'.") from exc
+    if parsed < 1:
+        raise ValueError(f"{name} debe ser mayor o igual a 1, se recibió '{value}'.")
+    return parsed
+
+
+def _parse_bool(name: str, value: Optional[str], default: bool) -> bool:
+    if value is None or not value.strip():
+        return default
+    lowered = value.strip().lower()
+    if lowered in {"1", "true", "yes", "si", "sí", "on"}:
+        return True
+    if lowered in {"0", "false", "no", "off"}:
+        return False
+    raise ValueError(f"{name} debe ser true o false, se recibió '{value}'.")
+
+
+def _parse_optional_float(name: str, value: Optional[str]) -> Optional[float]:
+    if value is None or value.strip().lower() in {"", "none"}:
+        return None
+    try:
+        return float(value.strip())
+    except ValueError as exc:
+        raise ValueError(f"{name} debe ser un número, se recibió '{value}'.") from exc
+
+
+def _parse_fraction(
+    name: str, value: Optional[str], *, allow_zero: bool = True
+) -> Optional[float]:
+    number = _parse_optional_float(name, value)
+    if number is not None and not (0 <= number <= 1 and (allow_zero or number > 0)):
+        bounds = "entre 0 y 1" if allow_zero else "mayor que 0 y como máximo 1"
+        raise ValueError(f"{name} debe ser {bounds}, se recibió '{value}'.")
+    return number
+
+
+def _parse_list(value: Optional[str]) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def _parse_project_path(value: Optional[str]) -> Optional[Path]:
+    if value is None or not value.strip():
+        return None
+    path = Path(value.strip()).expanduser()
+    if not path.is_absolute():
+        path = (PROJECT_ROOT / path).resolve()
+    return path
+
+
 @dataclass(frozen=True)
 class Settings:
     openai_api_key: str
@@ -40,6 +97,23 @@ class Settings:
     answer_column: str = "RESPUESTA"
     model_column: str = "MODELO"
     data_header: Optional[int] = None
+    data_cache: bool = True
+    concurrency: int = 1
+    shards: int = 1
+    request_timeout: Optional[float] = None
+    llm_cache_path: Optional[Path] = None
+    llm_cache_max_entries: int = 10_000
+    llm_cache_ttl: Optional[float] = None
+    incremental_save: bool = False
+    rate_limit_rpm: Optional[float] = None
+    rate_limit_tpm: Optional[float] = None
+    only_failed: bool = False
+    metrics_path: Optional[Path] = None
+    metrics_interval: float = 5.0
+    pack_size: int = 1
+    cascade_models: Tuple[str, ...] = ()
+    lexicon_threshold: Optional[float] = None
+    lexicon_sample: float = 0.05
 
     @classmethod
     def from_env(cls) -> "Settings":
@@ -59,21 +133,46 @@ class Settings:
                 f"MODEL_TEMPERATURE debe ser un número, se recibió '{temperature_value}'."
             ) from exc
 
-        data_file_env = os.getenv("DATA_FILE")
-        if data_file_env:
-            data_file_guess = Path(data_file_env).expanduser()
-            if not data_file_guess.is_absolute():
-                data_file_value = (PROJECT_ROOT / data_file_guess).resolve()
-            else:
-                data_file_value = data_file_guess
-        else:
-            data_file_value = DEFAULT_DATA_FILE
+        data_file_value = _parse_project_path(os.getenv("DATA_FILE")) or DEFAULT_DATA_FILE
 
         question_column = os.getenv("QUESTION_COLUMN", cls.question_column)
         answer_column = os.getenv("ANSWER_COLUMN", cls.answer_column)
         model_column = os.getenv("MODEL_COLUMN", cls.model_column)
 
         data_header = _parse_header(os.getenv("DATA_HEADER"))
+        data_cache = _parse_bool("DATA_CACHE", os.getenv("DATA_CACHE"), cls.data_cache)
+
+        concurrency = _parse_positive_int(
+            "CONCURRENCY", os.getenv("CONCURRENCY"), cls.concurrency
+        )
+        shards = _parse_positive_int("SHARDS", os.getenv("SHARDS"), cls.shards)
+        request_timeout = _parse_optional_float(
+            "REQUEST_TIMEOUT", os.getenv("REQUEST_TIMEOUT")
+        )
+
+        llm_cache_path = _parse_project_path(os.getenv("LLM_CACHE_PATH"))
+        llm_cache_max_entries = _parse_positive_int(
+            "LLM_CACHE_MAX_ENTRIES",
+            os.getenv("LLM_CACHE_MAX_ENTRIES"),
+            cls.llm_cache_max_entries,
+        )
+        llm_cache_ttl = _parse_optional_float("LLM_CACHE_TTL", os.getenv("LLM_CACHE_TTL"))
+        incremental_save = _parse_bool(
+            "INCREMENTAL_SAVE", os.getenv("INCREMENTAL_SAVE"), cls.incremental_save
+        )
+        rate_limit_rpm = _parse_optional_float("RATE_LIMIT_RPM", os.getenv("RATE_LIMIT_RPM"))
+        rate_limit_tpm = _parse_optional_float("RATE_LIMIT_TPM", os.getenv("RATE_LIMIT_TPM"))
+        only_failed = _parse_bool("ONLY_FAILED", os.getenv("ONLY_FAILED"), cls.only_failed)
+        cascade_models = _parse_list(os.getenv("CASCADE_MODELS"))
+        pack_size = _parse_positive_int("PACK_SIZE", os.getenv("PACK_SIZE"), cls.pack_size)
+        metrics_path = _parse_project_path(os.getenv("METRICS_PATH"))
+        metrics_interval = _parse_optional_float(
+            "METRICS_INTERVAL", os.getenv("METRICS_INTERVAL")
+        )
+        lexicon_threshold = _parse_fraction(
+            "LEXICON_THRESHOLD", os.getenv("LEXICON_THRESHOLD"), allow_zero=False
+        )
+        lexicon_sample = _parse_fraction("LEXICON_SAMPLE", os.getenv("LEXICON_SAMPLE"))
 
         return cls(
             openai_api_key=api_key,
@@ -84,6 +183,25 @@ class Settings:
             answer_column=answer_column,
             model_column=model_column,
             data_header=data_header,
+            data_cache=data_cache,
+            concurrency=concurrency,
+            shards=shards,
+            request_timeout=request_timeout,
+            llm_cache_path=llm_cache_path,
+            llm_cache_max_entries=llm_cache_max_entries,
+            llm_cache_ttl=llm_cache_ttl,
+            incremental_save=incremental_save,
+            rate_limit_rpm=rate_limit_rpm,
+            rate_limit_tpm=rate_limit_tpm,
+            only_failed=only_failed,
+            pack_size=pack_size,
+            cascade_models=cascade_models,
+            metrics_path=metrics_path,
+            metrics_interval=(
+                cls.metrics_interval if metrics_interval is None else metrics_interval
+            ),
+            lexicon_threshold=lexicon_threshold,
+            lexicon_sample=cls.lexicon_sample if lexicon_sample is None else lexicon_sample,
         )
 
 
@@ -0,0 +1,152 @@
+"""Cache persistente (SQLite) de respuestas de modelos de chat."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+class SQLiteResponseCache(BaseCache):
+    """Guarda respuestas en SQLite con tope de tamaño, desalojo LRU y TTL opcional.
+
+    LangChain llama a ``lookup``/``update`` con el prompt ya serializado
+    (los mensajes renderizados) y una cadena con la configuración del modelo
+    (nombre, temperatura, etc.), así que la clave es un hash de ambos.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: Optional[int] = 10_000,
+        ttl: Optional[float] = None,
+    ) -> None:
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries debe ser mayor que 0.")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(llm_string.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return [_generation_from_dict(item) for item in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        value = json.dumps(
+            [_generation_to_dict(generation) for generation in return_val],
+            ensure_ascii=False,
+            default=str,
+        )
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._connection.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los contadores de aciertos/fallos y el tamaño actual."""
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+def _generation_to_dict(generation: Generation) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "text": generation.text,
+        "generation_info": generation.generation_info,
+    }
+    if isinstance(generation, ChatGeneration):
+        payload["message"] = message_to_dict(generation.message)
+    return payload
+
+
+def _generation_from_dict(payload: Dict[str, Any]) -> Generation:
+    if "message" in payload:
+        (message,) = messages_from_dict([payload["message"]])
+        return ChatGeneration(message=message, generation_info=payload["generation_info"])
+    return Generation(text=payload["text"], generation_info=payload["generation_info"])
+
+
+@lru_cache(maxsize=None)
+def get_response_cache(
+    path: Path,
+    max_entries: Optional[int] = 10_000,
+    ttl: Optional[float] = None,
+) -> SQLiteResponseCache:
+    """Devuelve una instancia compartida por ruta para acumular contadores."""
+    return SQLiteResponseCache(path, max_entries=max_entries, ttl=ttl)
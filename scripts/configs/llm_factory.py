@@ -2,10 +2,37 @@ from __future__ import annotations
 
 from typing import Any, Optional
 
+import openai
+from langchain_core.caches import BaseCache
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
 from .config import Settings
+from .llm_cache import get_response_cache
+from .rate_limit import (
+    AsyncRateLimitedTransport,
+    RateLimitedTransport,
+    RateLimiter,
+    get_rate_limiter,
+)
+
+
+def build_response_cache(settings: Settings) -> Optional[BaseCache]:
+    """Devuelve el cache de respuestas configurado (``LLM_CACHE_PATH``) o ``None``."""
+    if settings.llm_cache_path is None:
+        return None
+    return get_response_cache(
+        settings.llm_cache_path,
+        max_entries=settings.llm_cache_max_entries,
+        ttl=settings.llm_cache_ttl,
+    )
+
+
+def build_rate_limiter(settings: Settings) -> Optional[RateLimiter]:
+    """Devuelve el limitador compartido (``RATE_LIMIT_RPM``/``RATE_LIMIT_TPM``) o ``None``."""
+    if settings.rate_limit_rpm is None and settings.rate_limit_tpm is None:
+        return None
+    return get_rate_limiter(settings.rate_limit_rpm, settings.rate_limit_tpm)
 
 
 def build_chat_model(
@@ -16,11 +43,34 @@ def build_chat_model(
     api_key: Optional[str] = None,
     **kwargs: Any,
 ) -> BaseChatModel:
-    """Crea una instancia de ChatOpenAI usando la configuración compartida."""
+    """Crea una instancia de ChatOpenAI usando la configuración compartida.
+
+    Si ``LLM_CACHE_PATH`` está definido, el modelo reutiliza las respuestas
+    guardadas para el mismo modelo, temperatura y mensajes. Pasar ``cache``
+    explícitamente tiene prioridad sobre la configuración.
+
+    Si hay límites de cuota configurados, los clientes HTTP del modelo pasan
+    por un limitador compartido por todas las cadenas del proceso.
+
+    ``REQUEST_TIMEOUT`` se usa como ``timeout`` del cliente salvo que se pase
+    otro explícitamente.
+    """
+    kwargs.setdefault("cache", build_response_cache(settings))
+    kwargs.setdefault("timeout", settings.request_timeout)
+
+    limiter = build_rate_limiter(settings)
+    if limiter is not None:
+        kwargs.setdefault(
+            "http_client",
+            openai.DefaultHttpxClient(transport=RateLimitedTransport(limiter)),
+        )
+        kwargs.setdefault(
+            "http_async_client",
+            openai.DefaultAsyncHttpxClient(transport=AsyncRateLimitedTransport(limiter)),
+        )
     return ChatOpenAI(
         model=model_name or settings.model_name,
         api_key=api_key or settings.openai_api_key,
         temperature=temperature if temperature is not None else settings.temperature,
         **kwargs,
     )
-
@@ -0,0 +1,207 @@
+"""Limitador de peticiones y tokens por minuto para la API de OpenAI.
+
+El limitador se instala como transporte de ``httpx`` en los clientes que
+``build_chat_model`` entrega a ``ChatOpenAI``. A ese nivel ve el cuerpo de
+cada petición (para estimar tokens antes de enviarla) y las cabeceras
+``x-ratelimit-*`` de la respuesta (para ajustarse a la cuota real).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional
+
+import httpx
+
+# Aproximación habitual para texto en inglés/español: ~4 caracteres por token.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Convierte valores como ``"1m30s"``, ``"6s"`` o ``"20ms"`` a segundos."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value.strip())
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """Estima los tokens que una petición de chat descontará de la cuota TPM.
+
+    OpenAI reserva los tokens del prompt más ``max_tokens`` al recibir la
+    petición, así que ambos se suman.
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return len(body) // CHARS_PER_TOKEN
+    if not isinstance(payload, dict):
+        return len(body) // CHARS_PER_TOKEN
+
+    tokens = 0
+    for message in payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else message
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        tokens += len(content) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+    return tokens + int(completion)
+
+
+class TokenBucket:
+    """Cubeta que se rellena de forma continua hasta ``per_minute`` unidades.
+
+    ``reserve`` descuenta de inmediato y devuelve cuánto hay que esperar; el
+    nivel puede quedar negativo, lo que ordena a los llamadores en la cola.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def observe(self, remaining: float, reset_seconds: Optional[float], now: float) -> None:
+        """Ajusta el nivel a lo que el servidor informa como disponible."""
+        self._refill(now)
+        if remaining < self.level:
+            self.level = remaining
+        if reset_seconds and remaining <= 0:
+            # Sin cuota restante: no volver a enviar hasta el reinicio.
+            self.level = min(self.level, -reset_seconds * self.rate)
+
+
+class RateLimiter:
+    """Limita peticiones (RPM) y tokens (TPM) compartidos por todos los clientes."""
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.waited_seconds = 0.0
+        self.throttled_requests = 0
+        self.rate_limited_responses = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            if wait > 0:
+                self.throttled_requests += 1
+                self.waited_seconds += wait
+        return wait
+
+    def acquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe_headers(self, headers: Mapping[str, str], status_code: int) -> None:
+        """Actualiza las cubetas con las cabeceras ``x-ratelimit-*`` de OpenAI."""
+        now = time.monotonic()
+        with self._lock:
+            if status_code == 429:
+                self.rate_limited_responses += 1
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                if bucket is None:
+                    continue
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining_value = float(remaining)
+                except ValueError:
+                    continue
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                bucket.observe(remaining_value, reset, now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "throttled_requests": self.throttled_requests,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "rate_limited_responses": self.rate_limited_responses,
+        }
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Transporte síncrono que pasa cada petición por el ``RateLimiter``."""
+
+    def __init__(self, limiter: RateLimiter, wrapped: Optional[httpx.BaseTransport] = None) -> None:
+        self.limiter = limiter
+        self.wrapped = wrapped or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.limiter.acquire(estimate_request_tokens(request.read()))
+        response = self.wrapped.handle_request(request)
+        self.limiter.observe_headers(response.headers, response.status_code)
+        return response
+
+    def close(self) -> None:
+        self.wrapped.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Variante asíncrona de ``RateLimitedTransport``."""
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        wrapped: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.limiter = limiter
+        self.wrapped = wrapped or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.aacquire(estimate_request_tokens(await request.aread()))
+        response = await self.wrapped.handle_async_request(request)
+        self.limiter.observe_headers(response.headers, response.status_code)
+        return response
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter(
+    requests_per_minute: Optional[float],
+    tokens_per_minute: Optional[float],
+) -> RateLimiter:
+    """Devuelve un limitador compartido por proceso para la misma cuota."""
+    return RateLimiter(
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
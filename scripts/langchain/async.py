@@ -1,27 +1,120 @@
+import argparse
 import asyncio
 import json
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+import numpy as np
 import pandas as pd
 from langchain_core.prompts import PromptTemplate
 
 from scripts.configs.config import get_settings
 from scripts.configs.llm_factory import build_chat_model
+from scripts.pipelines.batch import (
+    add_batch_arguments,
+    build_batch_request,
+    read_batch_results,
+    row_custom_id,
+    write_batch_requests,
+)
+from scripts.pipelines.classification_store import (
+    ClassificationStore,
+    content_hash,
+    prompt_version,
+)
+from scripts.pipelines.concurrency import AdaptiveLimiter, print_decision
+from scripts.pipelines.lexicon import LexiconStats, score_opinions
+from scripts.utils.io_utils import (
+    EXCEL_MAX_ROWS,
+    PartitionAppender,
+    compact_text_columns,
+    compare_memory,
+    ensure_column_exists,
+    iter_dataframe_chunks,
+    memory_report,
+    merge_partitions,
+    save_dataframe,
+    save_partitioned,
+)
 
 BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 INPUT_FILE = PROJECT_ROOT / "content" / "opiniones_usuarios.xlsx"
 OUTPUT_FILE = PROJECT_ROOT / "content" / "opiniones_usuarios_clasificadas.xlsx"
+# Clasificaciones anteriores por hash de la opinión; sólo se envían al modelo
+# las opiniones nuevas o modificadas.
+STORE_FILE = PROJECT_ROOT / ".cache" / "opiniones_clasificadas.sqlite"
 SCORE_COLUMN = "puntaje"
 SENTIMENT_COLUMN = "sentimiento"
+SENTIMENT_LABELS = ("Positivo", "Neutro", "Negativo")
+# Puntajes de 1 a 10 caben en un entero de 8 bits con nulos; las etiquetas de
+# sentimiento se guardan como categorías en lugar de una cadena por fila.
+SCORE_DTYPE = "Int8"
+SENTIMENT_DTYPE = pd.CategoricalDtype(SENTIMENT_LABELS)
+# Concurrencia inicial; ``AdaptiveLimiter`` la ajusta durante la ejecución.
 CONCURRENCY_LIMIT = 5
+MAX_CONCURRENCY = 50
+CHUNK_SIZE = 1_000
+# Opiniones en cola por worker y filas clasificadas que se acumulan antes de
+# escribir una partición de ``OUTPUT_FILE``.
+QUEUE_FACTOR = 2
+FLUSH_ROWS = 5_000
+# Peticiones fallidas de ``--ingest-batch`` que se muestran por consola.
+BATCH_ERROR_PREVIEW = 10
+# Filas del primer bloque con que se estima la memoria por columna del resumen.
+MEMORY_SAMPLE_ROWS = 1_000
 
+# Respuestas ilegibles que esperan un segundo intento, y cuántas se reenvían
+# a la vez. El reenvío incluye la respuesta anterior, recortada.
+REASK_QUEUE_SIZE = 100
+REASK_WORKERS = 2
+REASK_PREVIEW_CHARS = 500
+REASK_NOTE = (
+    "\n\nTu respuesta anterior no tenía el formato pedido:\n'''{previous}'''\n"
+    "Responde ahora solo con el objeto JSON, sin texto ni bloques de código."
+)
+# Salida estructurada: el modelo sólo puede devolver un JSON con este esquema.
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "clasificacion_opinion",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "score": {"type": "integer"},
+                "sentiment": {"type": "string", "enum": list(SENTIMENT_LABELS)},
+            },
+            "required": ["score", "sentiment"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-def _load_opinions(path: Path) -> pd.DataFrame:
+_DONE = object()
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _iter_opinion_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
     if not path.exists():
         raise FileNotFoundError(f"No se encontró el archivo de opiniones en: {path}")
-    return pd.read_excel(path, header=0)
+    return iter_dataframe_chunks(
+        path, header=0, chunk_size=chunk_size, cache=get_settings().data_cache
+    )
 
 
 def _prepare_opinion_series(df: pd.DataFrame) -> Tuple[pd.Series, str]:
@@ -32,41 +125,73 @@ def _prepare_opinion_series(df: pd.DataFrame) -> Tuple[pd.Series, str]:
 
 
 def _ensure_output_columns(df: pd.DataFrame) -> None:
-    if SCORE_COLUMN not in df.columns:
-        df[SCORE_COLUMN] = None
-    if SENTIMENT_COLUMN not in df.columns:
-        df[SENTIMENT_COLUMN] = None
+    ensure_column_exists(df, SCORE_COLUMN, dtype=SCORE_DTYPE)
+    ensure_column_exists(df, SENTIMENT_COLUMN, dtype=SENTIMENT_DTYPE)
 
 
-def _build_chain():
-    settings = get_settings()
-    prompt = PromptTemplate(
+def _object_memory(df: pd.DataFrame, opinion_column: str) -> pd.Series:
+    """Memoria del bloque si las columnas compactadas fueran ``object``."""
+    legacy = {column: object for column in (opinion_column, SCORE_COLUMN, SENTIMENT_COLUMN)}
+    return memory_report(df.astype(legacy))
+
+
+def _build_prompt() -> PromptTemplate:
+    return PromptTemplate(
         template=(
             "Analiza la siguiente opinión de un usuario:\n"
             "Opinión: '''{opinion}'''\n\n"
             "Devuelve exclusivamente un JSON con esta estructura exacta:\n"
             "{{\"score\": <entero de 1 a 10>, \"sentiment\": \"Positivo|Neutro|Negativo\"}}\n"
-            "Recuerda: solo responde con el JSON."
+            "Recuerda: solo responde con el JSON.{correction}"
         ),
         input_variables=["opinion"],
+        partial_variables={"correction": ""},
     )
-    llm = build_chat_model(settings)
-    return prompt | llm
 
 
-def _parse_response(raw_response: Any) -> Tuple[Optional[int], Optional[str]]:
-    content = getattr(raw_response, "content", raw_response)
+def _build_chain():
+    settings = get_settings()
+    llm = build_chat_model(settings).bind(response_format=RESPONSE_FORMAT)
+    return _build_prompt() | llm
+
+
+def _extract_json(content: Any) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Devuelve el objeto JSON de la respuesta y si hubo que buscarlo en el texto.
+
+    Si la respuesta no es JSON puro, se toma el primer bloque de código o el
+    texto entre la primera ``{`` y la última ``}``.
+    """
     if not isinstance(content, str):
-        return None, None
+        return None, False
     try:
         payload = json.loads(content)
     except json.JSONDecodeError:
+        pass
+    else:
+        return (payload if isinstance(payload, dict) else None), False
+
+    fenced = _CODE_FENCE.search(content)
+    text = fenced.group(1) if fenced else content
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None, True
+    try:
+        payload = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return None, True
+    return (payload if isinstance(payload, dict) else None), True
+
+
+def _read_classification(payload: Optional[Dict[str, Any]]) -> Tuple[Optional[int], Optional[str]]:
+    if payload is None:
         return None, None
 
     score = payload.get("score")
     sentiment = payload.get("sentiment")
 
-    if isinstance(score, (int, float)):
+    if isinstance(score, str) and score.strip().isdigit():
+        score = int(score)
+    if isinstance(score, (int, float)) and not isinstance(score, bool):
         score = int(score)
         if not (1 <= score <= 10):
             score = None
@@ -75,7 +200,7 @@ def _parse_response(raw_response: Any) -> Tuple[Optional[int], Optional[str]]:
 
     if isinstance(sentiment, str):
         sentiment_normalized = sentiment.strip().capitalize()
-        if sentiment_normalized not in {"Positivo", "Neutro", "Negativo"}:
+        if sentiment_normalized not in SENTIMENT_LABELS:
             sentiment = None
         else:
             sentiment = sentiment_normalized
@@ -85,49 +210,530 @@ def _parse_response(raw_response: Any) -> Tuple[Optional[int], Optional[str]]:
     return score, sentiment
 
 
-async def _analyze_opinion(
+def _parse_response(raw_response: Any) -> Tuple[Optional[int], Optional[str]]:
+    payload, _ = _extract_json(getattr(raw_response, "content", raw_response))
+    return _read_classification(payload)
+
+
+@dataclass
+class ParseStats:
+    """Cuántas respuestas se pudieron leer y por qué vía, y cuántas llamadas fallaron."""
+
+    responses: int = 0
+    direct: int = 0
+    extracted: int = 0
+    reasked: int = 0
+    recovered: int = 0
+    lost: int = 0
+    failed_calls: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def record_failure(self, reason: str) -> None:
+        """Una llamada sin respuesta utilizable (error de la API o contenido no textual)."""
+        self.failed_calls += 1
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def record(self, parsed: bool, extracted: bool) -> None:
+        self.responses += 1
+        if not parsed:
+            self.reasked += 1
+        elif extracted:
+            self.extracted += 1
+        else:
+            self.direct += 1
+
+    def summary(self) -> Dict[str, Any]:
+        responses = max(self.responses, 1)
+        calls = max(self.responses + self.failed_calls, 1)
+        return {
+            "llamadas_fallidas": self.failed_calls,
+            "tasa_llamadas_fallidas_pct": round(100 * self.failed_calls / calls, 2),
+            "errores": dict(self.errors),
+            "respuestas": self.responses,
+            "json_directo": self.direct,
+            "json_extraido": self.extracted,
+            "reenviadas": self.reasked,
+            "recuperadas": self.recovered,
+            "perdidas": self.lost,
+            "tasa_fallo_parseo_pct": round(100 * self.reasked / responses, 2),
+            "tasa_perdidas_pct": round(100 * self.lost / responses, 2),
+        }
+
+
+async def _request_classification(
     chain,
-    opinion: str,
-    semaphore: asyncio.Semaphore,
-) -> Tuple[Optional[int], Optional[str]]:
-    if not isinstance(opinion, str) or not opinion.strip():
-        return None, None
+    variables: Dict[str, str],
+    limiter: AdaptiveLimiter,
+    stats: ParseStats,
+) -> Optional[str]:
+    """Contenido de la respuesta del modelo, o ``None`` si la llamada falla (queda en ``stats``)."""
+    try:
+        async with limiter.slot():
+            response = await chain.ainvoke(variables)
+    except Exception as exc:
+        stats.record_failure(type(exc).__name__)
+        return None
+    content = getattr(response, "content", response)
+    if not isinstance(content, str):
+        stats.record_failure("contenido no textual")
+        return None
+    return content
+
 
-    async with semaphore:
+async def _as_async_iter(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+def build_limiter() -> AdaptiveLimiter:
+    """Empieza con ``CONCURRENCY_LIMIT`` peticiones y se ajusta entre 1 y ``MAX_CONCURRENCY``."""
+    return AdaptiveLimiter(
+        initial=CONCURRENCY_LIMIT,
+        maximum=MAX_CONCURRENCY,
+        on_decision=print_decision,
+    )
+
+
+async def process_opinions(
+    opinions: Union[Iterable[Tuple[Any, str]], AsyncIterable[Tuple[Any, str]]],
+    limiter: Optional[AdaptiveLimiter] = None,
+    chain=None,
+    stats: Optional[ParseStats] = None,
+) -> AsyncIterator[Tuple[Any, Optional[int], Optional[str]]]:
+    """Clasifica pares ``(clave, opinión)`` con un grupo fijo de workers.
+
+    Hay tantos workers como el máximo de ``limiter``, pero sólo
+    ``limiter.limit`` peticiones en vuelo a la vez. Las opiniones pasan por
+    una cola acotada, así que sólo hay unas pocas pendientes en memoria
+    aunque la entrada tenga millones. Los resultados ``(clave, puntaje,
+    sentimiento)`` se entregan a medida que terminan, no en el orden de
+    entrada.
+
+    Las respuestas que no se pueden leer pasan a una cola pequeña de
+    reenvío, donde se vuelven a pedir una vez indicando al modelo qué
+    respondió; ``stats`` acumula los conteos de cada caso.
+    """
+    chain = chain if chain is not None else _build_chain()
+    limiter = limiter if limiter is not None else build_limiter()
+    stats = stats if stats is not None else ParseStats()
+    workers = limiter.maximum
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=workers * QUEUE_FACTOR)
+    reasks: asyncio.Queue = asyncio.Queue(maxsize=REASK_QUEUE_SIZE)
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=workers * QUEUE_FACTOR)
+
+    async def produce() -> None:
         try:
-            response = await chain.ainvoke({"opinion": opinion})
-        except Exception:
-            return None, None
+            async for item in _as_async_iter(opinions):
+                await inbox.put(item)
+        finally:
+            # Aunque la lectura falle, los workers reciben la marca de fin.
+            if not asyncio.current_task().cancelling():
+                await inbox.put(_DONE)
 
-    return _parse_response(response)
+    async def work() -> None:
+        while (item := await inbox.get()) is not _DONE:
+            key, opinion = item
+            if not isinstance(opinion, str) or not opinion.strip():
+                await outbox.put((key, None, None))
+                continue
+            content = await _request_classification(chain, {"opinion": opinion}, limiter, stats)
+            if content is None:
+                await outbox.put((key, None, None))
+                continue
+            payload, extracted = _extract_json(content)
+            score, sentiment = _read_classification(payload)
+            stats.record(score is not None and sentiment is not None, extracted)
+            if score is None or sentiment is None:
+                await reasks.put((key, opinion, content))
+            else:
+                await outbox.put((key, score, sentiment))
+        # La marca de fin se devuelve a la cola para el siguiente worker.
+        inbox.put_nowait(_DONE)
 
+    async def reask() -> None:
+        while (item := await reasks.get()) is not _DONE:
+            key, opinion, previous = item
+            correction = REASK_NOTE.format(previous=previous[:REASK_PREVIEW_CHARS])
+            content = await _request_classification(
+                chain, {"opinion": opinion, "correction": correction}, limiter, stats
+            )
+            score, sentiment = _parse_response(content)
+            if score is None or sentiment is None:
+                stats.lost += 1
+            else:
+                stats.recovered += 1
+            await outbox.put((key, score, sentiment))
+        await outbox.put(_DONE)
 
-async def process_opinions(opinions: Iterable[str], concurrency: int = CONCURRENCY_LIMIT):
-    chain = _build_chain()
-    semaphore = asyncio.Semaphore(concurrency)
-    tasks = [
-        asyncio.create_task(_analyze_opinion(chain, opinion, semaphore))
-        for opinion in opinions
-    ]
-    return await asyncio.gather(*tasks)
+    async def close_reasks(pool: List[asyncio.Task]) -> None:
+        await asyncio.gather(*pool, return_exceptions=True)
+        for _ in range(REASK_WORKERS):
+            await reasks.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    pool = [asyncio.create_task(work()) for _ in range(workers)]
+    tasks = [producer, *pool, asyncio.create_task(close_reasks(pool))]
+    tasks += [asyncio.create_task(reask()) for _ in range(REASK_WORKERS)]
+    try:
+        finished = 0
+        while finished < REASK_WORKERS:
+            result = await outbox.get()
+            if result is _DONE:
+                finished += 1
+            else:
+                yield result
+        # Propaga un fallo de lectura o de un worker.
+        for task in tasks:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _aiter_opinion_chunks(path: Path) -> AsyncIterator[pd.DataFrame]:
+    chunks = _iter_opinion_chunks(path)
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        yield chunk
+
+
+class _OpinionWriter:
+    """Completa los bloques con sus resultados y los vuelca a disco en orden.
+
+    Un bloque se escribe cuando todas sus opiniones tienen resultado; los
+    bloques listos se acumulan hasta ``flush_rows`` filas y se guardan como
+    una partición más de ``OUTPUT_FILE`` (ver ``PartitionAppender``). La
+    escritura corre en un hilo para no frenar las peticiones en vuelo.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        flush_rows: int = FLUSH_ROWS,
+        store: Optional[ClassificationStore] = None,
+        store_key: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.path = path
+        self.flush_rows = flush_rows
+        self.store = store
+        self.store_key = store_key or {}
+        self.appender = PartitionAppender(path)
+        self.pending: Dict[int, List[Any]] = {}
+        self.ready: List[pd.DataFrame] = []
+        self.ready_rows = 0
+        self.added = 0
+        self.next_to_write = 0
+        self.rows_collected = 0
+        self._memory_per_row: Optional[Tuple[pd.Series, pd.Series]] = None
+        self._write: Optional[asyncio.Task] = None
+
+    def add(self, chunk: pd.DataFrame, opinion_column: str, hashes: pd.Series) -> int:
+        """Registra un bloque; ``hashes`` son las opiniones que se enviarán al modelo."""
+        number = self.added
+        self.added += 1
+        self.pending[number] = [chunk, opinion_column, len(hashes), hashes]
+        self._collect()
+        return number
+
+    def record(self, key: Tuple[int, Any], score: Optional[int], sentiment: Optional[str]) -> None:
+        number, index = key
+        entry = self.pending[number]
+        entry[0].at[index, SCORE_COLUMN] = score
+        entry[0].at[index, SENTIMENT_COLUMN] = sentiment
+        entry[2] -= 1
+        self._collect()
+
+    def _collect(self) -> None:
+        while (entry := self.pending.get(self.next_to_write)) is not None and entry[2] == 0:
+            del self.pending[self.next_to_write]
+            self.next_to_write += 1
+            chunk, opinion_column, _, hashes = entry
+            self._store_results(chunk, hashes)
+            self.ready.append(chunk)
+            self.ready_rows += len(chunk)
+            self.rows_collected += len(chunk)
+            if self._memory_per_row is None and len(chunk):
+                sample = chunk.head(MEMORY_SAMPLE_ROWS)
+                self._memory_per_row = (
+                    _object_memory(sample, opinion_column) / len(sample),
+                    memory_report(sample) / len(sample),
+                )
+
+    def _store_results(self, chunk: pd.DataFrame, hashes: pd.Series) -> None:
+        if self.store is None or hashes.empty:
+            return
+        results = chunk.loc[hashes.index, [SCORE_COLUMN, SENTIMENT_COLUMN]]
+        complete = results.notna().all(axis=1)
+        self.store.save(
+            zip(
+                hashes[complete],
+                results.loc[complete, SCORE_COLUMN],
+                results.loc[complete, SENTIMENT_COLUMN],
+            ),
+            **self.store_key,
+        )
+
+    def memory_comparison(self) -> Optional[pd.DataFrame]:
+        """Memoria por columna (``object`` frente a compactos) estimada con la muestra."""
+        if self._memory_per_row is None:
+            return None
+        before, after = self._memory_per_row
+        return compare_memory(before * self.rows_collected, after * self.rows_collected)
+
+    async def flush(self, *, force: bool = False) -> None:
+        """Lanza la escritura de los bloques listos si suman ``flush_rows`` filas.
+
+        Antes se espera la escritura anterior: las particiones quedan en orden
+        y como mucho hay una esperando en memoria.
+        """
+        if not self.ready or (not force and self.ready_rows < self.flush_rows):
+            return
+        frame = pd.concat(self.ready)
+        self.ready = []
+        self.ready_rows = 0
+        await self._wait_write()
+        self._write = asyncio.create_task(asyncio.to_thread(self.appender.append, frame))
+
+    async def _wait_write(self) -> None:
+        if self._write is not None:
+            write, self._write = self._write, None
+            await write
+
+    async def close(self) -> Path:
+        """Escribe lo pendiente y une las particiones en ``path`` si caben en una hoja."""
+        await self.flush(force=True)
+        await self._wait_write()
+        if not self.appender.entries:
+            save_dataframe(pd.DataFrame(), self.path)
+            return self.path
+        if self.appender.total_rows < EXCEL_MAX_ROWS:
+            merge_partitions(self.appender.manifest_path, self.path)
+            return self.path
+        return self.appender.manifest_path
+
+
+def _save_output(df: pd.DataFrame) -> Path:
+    """Guarda el resultado; si no cabe en una hoja, lo reparte en varios archivos."""
+    if len(df) < EXCEL_MAX_ROWS:
+        save_dataframe(df, OUTPUT_FILE)
+        return OUTPUT_FILE
+    return save_partitioned(df, OUTPUT_FILE)
+
+
+def _store_key() -> Dict[str, str]:
+    """Modelo y versión del prompt con que se guardan las clasificaciones.
+
+    La versión cambia si cambian el prompt, el formato de salida o la
+    temperatura, y entonces todas las opiniones se vuelven a clasificar.
+    """
+    settings = get_settings()
+    return {
+        "model": settings.model_name,
+        "prompt_version": prompt_version(
+            _build_prompt().template, RESPONSE_FORMAT, settings.temperature
+        ),
+    }
+
+
+def _fill_from_store(
+    chunk: pd.DataFrame,
+    opinion_column: str,
+    store: ClassificationStore,
+    store_key: Dict[str, str],
+) -> pd.Series:
+    """Copia al bloque las clasificaciones guardadas y devuelve los hashes que faltan."""
+    hashes = _pending_opinions(chunk[opinion_column]).map(content_hash)
+    found = store.lookup(hashes.tolist(), **store_key)
+    reused = hashes.isin(list(found))
+    if reused.any():
+        cached = hashes[reused].map(found)
+        chunk.loc[cached.index, SCORE_COLUMN] = [score for score, _ in cached]
+        chunk.loc[cached.index, SENTIMENT_COLUMN] = [sentiment for _, sentiment in cached]
+    return hashes[~reused]
+
+
+def _in_lexicon_sample(hashes: pd.Series, fraction: float) -> pd.Series:
+    """Muestra determinista por hash: la misma opinión cae siempre del mismo lado."""
+    buckets = np.frombuffer(bytes.fromhex("".join(hashes.str[:8])), dtype=">u4") % 10_000
+    return pd.Series(buckets < fraction * 10_000, index=hashes.index)
+
+
+def _apply_lexicon(
+    chunk: pd.DataFrame,
+    opinion_column: str,
+    missing: pd.Series,
+    threshold: float,
+    sample: float,
+    lexicon_stats: LexiconStats,
+) -> Tuple[pd.Series, Dict[Any, Tuple[int, str]]]:
+    """Resuelve con el léxico las opiniones claras y devuelve las que siguen pendientes.
+
+    Una fracción ``sample`` de las opiniones que el léxico resolvería se envía
+    igualmente al modelo para medir la coincidencia; sus predicciones del
+    léxico se devuelven por índice de fila.
+    """
+    lexicon = score_opinions(chunk.loc[missing.index, opinion_column])
+    confident = lexicon["confidence"] >= threshold
+    sampled = confident & _in_lexicon_sample(missing, sample)
+    accepted = lexicon[confident & ~sampled]
+    chunk.loc[accepted.index, SCORE_COLUMN] = accepted["score"].astype(int).tolist()
+    chunk.loc[accepted.index, SENTIMENT_COLUMN] = accepted["sentiment"].tolist()
+    lexicon_stats.scored += len(lexicon)
+    lexicon_stats.accepted += len(accepted)
+    compared = lexicon[sampled]
+    predictions = dict(
+        zip(
+            compared.index,
+            zip(compared["score"].astype(int).tolist(), compared["sentiment"].tolist()),
+        )
+    )
+    return missing.drop(accepted.index), predictions
 
 
 async def main() -> None:
-    df = _load_opinions(INPUT_FILE)
-    opinions, opinion_column = _prepare_opinion_series(df)
-    _ensure_output_columns(df)
+    chain = _build_chain()
+    limiter = build_limiter()
+    stats = ParseStats()
+    store = ClassificationStore(STORE_FILE)
+    store_key = _store_key()
+    writer = _OpinionWriter(OUTPUT_FILE, store=store, store_key=store_key)
+    settings = get_settings()
+    lexicon_stats = LexiconStats()
+    lexicon_sample: Dict[Tuple[int, Any], Tuple[int, str]] = {}
+
+    async def opinions() -> AsyncIterator[Tuple[Tuple[int, Any], str]]:
+        async for chunk in _aiter_opinion_chunks(INPUT_FILE):
+            _, opinion_column = _prepare_opinion_series(chunk)
+            compact_text_columns(chunk, [opinion_column])
+            _ensure_output_columns(chunk)
+            missing = _fill_from_store(chunk, opinion_column, store, store_key)
+            predictions: Dict[Any, Tuple[int, str]] = {}
+            if settings.lexicon_threshold is not None:
+                missing, predictions = _apply_lexicon(
+                    chunk,
+                    opinion_column,
+                    missing,
+                    settings.lexicon_threshold,
+                    settings.lexicon_sample,
+                    lexicon_stats,
+                )
+            number = writer.add(chunk, opinion_column, missing)
+            await writer.flush()
+            lexicon_sample.update({(number, index): value for index, value in predictions.items()})
+            for index, opinion in chunk.loc[missing.index, opinion_column].items():
+                yield (number, index), opinion
+
+    async for key, score, sentiment in process_opinions(opinions(), limiter, chain=chain, stats=stats):
+        if key in lexicon_sample:
+            lexicon_stats.compare(lexicon_sample.pop(key), score, sentiment)
+        writer.record(key, score, sentiment)
+        await writer.flush()
+
+    output = await writer.close()
+    print(f"Archivo generado: {output}")
+    print(f"Opiniones escritas: {writer.appender.total_rows}")
+    print(f"Concurrencia adaptativa: {limiter.stats()}")
+    print(f"Lectura de respuestas: {stats.summary()}")
+    print(f"Clasificaciones guardadas: {store.stats()}")
+    if settings.lexicon_threshold is not None:
+        print(f"Preclasificación por léxico: {lexicon_stats.summary()}")
+    memory = writer.memory_comparison()
+    if memory is not None:
+        print(
+            "Memoria por columna estimada con las primeras "
+            f"{MEMORY_SAMPLE_ROWS} filas (object frente a tipos compactos):"
+        )
+        print(memory)
 
-    results = await process_opinions(opinions)
 
-    for index, (score, sentiment) in zip(opinions.index, results):
-        df.at[index, SCORE_COLUMN] = score
-        df.at[index, SENTIMENT_COLUMN] = sentiment
+def _pending_opinions(opinions: pd.Series) -> pd.Series:
+    return opinions[opinions.map(lambda value: isinstance(value, str) and bool(value.strip()))]
 
-    df.to_excel(OUTPUT_FILE, index=False)
-    print(f"Archivo generado: {OUTPUT_FILE}")
-    print(df)
+
+def export_batch(path: Path) -> int:
+    """Escribe una petición Batch API por opinión sin clasificación guardada."""
+    settings = get_settings()
+    prompt = _build_prompt()
+    store = ClassificationStore(STORE_FILE)
+    store_key = _store_key()
+
+    def requests():
+        for chunk in _iter_opinion_chunks(INPUT_FILE):
+            opinions, opinion_column = _prepare_opinion_series(chunk)
+            _ensure_output_columns(chunk)
+            missing = _fill_from_store(chunk, opinion_column, store, store_key)
+            for index, opinion in opinions[missing.index].items():
+                yield build_batch_request(
+                    row_custom_id(index),
+                    prompt.format_prompt(opinion=opinion).to_messages(),
+                    model=settings.model_name,
+                    temperature=settings.temperature,
+                    response_format=RESPONSE_FORMAT,
+                )
+
+    return write_batch_requests(path, requests())
+
+
+def ingest_batch(path: Path) -> pd.DataFrame:
+    """Genera ``OUTPUT_FILE`` a partir de un archivo de resultados de la Batch API.
+
+    Las peticiones fallidas dejan vacías ``puntaje`` y ``sentimiento`` (no se
+    guardan en ``STORE_FILE``, así que vuelven a exportarse) y se resumen por
+    consola con su motivo.
+    """
+    results = read_batch_results(path)
+    failed: Dict[str, str] = {}
+    store = ClassificationStore(STORE_FILE)
+    store_key = _store_key()
+    frames: List[pd.DataFrame] = []
+    for chunk in _iter_opinion_chunks(INPUT_FILE):
+        _, opinion_column = _prepare_opinion_series(chunk)
+        compact_text_columns(chunk, [opinion_column])
+        _ensure_output_columns(chunk)
+        missing = _fill_from_store(chunk, opinion_column, store, store_key)
+        classified: List[Tuple[str, int, str]] = []
+        for index, hash_ in missing.items():
+            result = results.get(row_custom_id(index))
+            if result is None:
+                continue
+            if result.content is None:
+                failed[result.custom_id] = result.error or "sin contenido"
+                continue
+            score, sentiment = _parse_response(result.content)
+            chunk.at[index, SCORE_COLUMN] = score
+            chunk.at[index, SENTIMENT_COLUMN] = sentiment
+            if score is not None and sentiment is not None:
+                classified.append((hash_, score, sentiment))
+        store.save(classified, **store_key)
+        frames.append(chunk)
+
+    df = pd.concat(frames) if frames else pd.DataFrame()
+    _save_output(df)
+    if failed:
+        print(f"Peticiones fallidas en el lote: {len(failed)}")
+        for custom_id, error in list(failed.items())[:BATCH_ERROR_PREVIEW]:
+            print(f"  {custom_id}: {error}")
+    return df
+
+
+def cli(argv: Optional[Sequence[str]] = None) -> None:
+    args = add_batch_arguments(argparse.ArgumentParser()).parse_args(argv)
+    if args.export_batch is not None:
+        count = export_batch(args.export_batch)
+        print(f"{count} peticiones escritas en {args.export_batch}")
+    elif args.ingest_batch is not None:
+        df = ingest_batch(args.ingest_batch)
+        print(f"Archivo generado: {OUTPUT_FILE}")
+        print(df)
+    else:
+        asyncio.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    cli()
 
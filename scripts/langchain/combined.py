@@ -0,0 +1,55 @@
+from scripts.configs.config import get_settings
+from scripts.configs.llm_factory import build_response_cache
+from scripts.langchain import friendly, simple
+from scripts.pipelines.metrics import print_progress
+from scripts.pipelines.multi import MultiPromptRunner, PromptSpec
+from scripts.utils.io_utils import text_dtype
+
+
+def main() -> None:
+    settings = get_settings()
+
+    runner = MultiPromptRunner(
+        settings=settings,
+        specs=[
+            PromptSpec(
+                prompt=simple.build_prompt(),
+                output_column=settings.model_column,
+                prompt_variable="question",
+                output_dtype=text_dtype(),
+            ),
+            PromptSpec(
+                prompt=friendly.build_prompt(),
+                output_column=friendly.FRIENDLY_COLUMN,
+                prompt_variable="consulta",
+                output_dtype=text_dtype(),
+            ),
+        ],
+        input_column=settings.question_column,
+        skip_rows=1,
+        concurrency=settings.concurrency,
+        row_timeout=settings.request_timeout,
+        checkpoint=True,
+        coalesce_duplicates=True,
+        incremental_save=settings.incremental_save,
+        only_failed=settings.only_failed,
+        pack_size=settings.pack_size,
+        compact_input=True,
+        on_progress=print_progress,
+        metrics_path=settings.metrics_path,
+        metrics_interval=settings.metrics_interval,
+    )
+
+    df = runner.run()
+    print("Respuestas directas y amigables agregadas en una sola pasada.")
+    print(df)
+    for column, plan in runner.last_plans.items():
+        print(f"Resumen {column}: {plan.summary()}")
+
+    cache = build_response_cache(settings)
+    if cache is not None:
+        print(f"Cache de respuestas: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from typing import List
+
+import pandas as pd
+
+from scripts.configs.config import get_settings
+from scripts.langchain.friendly import FRIENDLY_COLUMN
+from scripts.pipelines.evaluation import evaluate_answers, score_columns
+from scripts.utils.io_utils import (
+    load_dataframe,
+    rename_numeric_columns,
+    save_dataframe,
+    write_back_columns,
+)
+
+
+def _name_columns_from_first_row(df: pd.DataFrame) -> None:
+    """Sin ``DATA_HEADER`` los encabezados quedan en la primera fila (que se omite)."""
+    if df.empty:
+        return
+    labels = df.iloc[0]
+    rename_numeric_columns(
+        df,
+        {
+            column: labels[column]
+            for column in df.columns
+            if isinstance(column, int) and isinstance(labels[column], str)
+        },
+    )
+
+
+def main() -> None:
+    settings = get_settings()
+    df = load_dataframe(
+        settings.data_file,
+        header=settings.data_header,
+    )
+    rename_numeric_columns(df, {0: settings.question_column, 1: settings.answer_column})
+    skip_rows = 0
+    if settings.data_header is None:
+        _name_columns_from_first_row(df)
+        skip_rows = 1
+
+    answer_columns: List[str] = [
+        column for column in (settings.model_column, FRIENDLY_COLUMN) if column in df.columns
+    ]
+    if not answer_columns:
+        print(
+            f"No hay columnas {settings.model_column} ni {FRIENDLY_COLUMN} que evaluar; "
+            "ejecuta antes simple.py o friendly.py."
+        )
+        return
+
+    summary = evaluate_answers(
+        df,
+        reference_column=settings.answer_column,
+        answer_columns=answer_columns,
+        skip_rows=skip_rows,
+    )
+    if settings.incremental_save:
+        write_back_columns(
+            df,
+            settings.data_file,
+            {column: None for column in score_columns(answer_columns)},
+            header=settings.data_header,
+        )
+    else:
+        save_dataframe(df, settings.data_file)
+
+    print(f"Evaluación frente a {settings.answer_column}:")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
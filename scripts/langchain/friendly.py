@@ -1,13 +1,22 @@
+import argparse
+from typing import Optional, Sequence
+
 from langchain_core.prompts import PromptTemplate
 
 from scripts.configs.config import get_settings
+from scripts.configs.llm_factory import build_response_cache
 from scripts.pipelines.base import TabularPromptRunner
+from scripts.pipelines.batch import add_batch_arguments
+from scripts.pipelines.cascade import build_cascade
+from scripts.pipelines.metrics import print_progress
+from scripts.utils.io_utils import text_dtype
 
 
-def main() -> None:
-    settings = get_settings()
+FRIENDLY_COLUMN = "MODELO_FRIENDLY"
+
 
-    prompt_template = PromptTemplate(
+def build_prompt() -> PromptTemplate:
+    return PromptTemplate(
         template=(
             "Responde de forma cercana y positiva en máximo dos frases la siguiente pregunta: "
             "'''{consulta}'''"
@@ -15,18 +24,49 @@ def main() -> None:
         input_variables=["consulta"],
     )
 
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = add_batch_arguments(argparse.ArgumentParser()).parse_args(argv)
+    settings = get_settings()
+
+    prompt_template = build_prompt()
+
     runner = TabularPromptRunner(
         settings=settings,
         prompt=prompt_template,
         input_column=settings.question_column,
-        output_column="MODELO_FRIENDLY",
+        output_column=FRIENDLY_COLUMN,
         prompt_variable="consulta",
         skip_rows=1,
+        concurrency=settings.concurrency,
+        shards=settings.shards,
+        row_timeout=settings.request_timeout,
+        checkpoint=True,
+        coalesce_duplicates=True,
+        incremental_save=settings.incremental_save,
+        only_failed=settings.only_failed,
+        pack_size=settings.pack_size,
+        output_dtype=text_dtype(),
+        compact_input=True,
+        cascade=build_cascade(settings.cascade_models),
+        on_progress=print_progress,
+        metrics_path=settings.metrics_path,
+        metrics_interval=settings.metrics_interval,
     )
 
-    df = runner.run()
+    if args.export_batch is not None:
+        plan = runner.export_batch(args.export_batch)
+        print(f"{plan.calls} peticiones escritas en {args.export_batch}")
+        return
+
+    df = runner.ingest_batch(args.ingest_batch) if args.ingest_batch else runner.run()
     print("Respuestas amigables agregadas al DataFrame y guardadas en el archivo.")
     print(df)
+    print(f"Resumen: {runner.last_plan.summary()}")
+
+    cache = build_response_cache(settings)
+    if cache is not None:
+        print(f"Cache de respuestas: {cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,28 +1,106 @@
+"""Pipelines reutilizables para procesar datasets con LangChain."""
+
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional
+import asyncio
+import math
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import pandas as pd
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
 from langchain_core.prompts import BasePromptTemplate
 
 from scripts.configs.config import Settings
 from scripts.utils.io_utils import (
+    compact_text_columns,
     ensure_column_exists,
-    iter_rows,
+    iter_dataframe_chunks,
     load_dataframe,
     rename_numeric_columns,
     save_dataframe,
+    supports_write_back,
+    text_dtype,
+    write_back_columns,
 )
 from scripts.configs.llm_factory import build_chat_model
+from scripts.pipelines.batch import (
+    BatchRequestError,
+    build_batch_request,
+    read_batch_results,
+    row_custom_id,
+    write_batch_requests,
+)
+from scripts.pipelines.cascade import CascadeChain, CascadeTier, ModelTimer
+from scripts.pipelines.checkpoint import (
+    ProgressJournal,
+    journal_path_for,
+    shard_journal_paths,
+)
+from scripts.pipelines.metrics import ProgressCallback, RunMetrics, metrics_path_for
+from scripts.pipelines.packing import (
+    PACK_PROMPT,
+    build_pack_input,
+    iter_packs,
+    parse_packed_response,
+)
+from scripts.pipelines.planning import RunPlan, combine_plans, empty_plan, plan_rows
+from scripts.pipelines.retry import CLIENT_MAX_RETRIES, RetryPolicy
+from scripts.pipelines.sharding import run_sharded
 
 RowMapper = Callable[[pd.Series], Dict[str, Any]]
 ResponseParser = Callable[[Any], Any]
+PendingRow = Tuple[List[Any], Dict[str, Any]]
+
+
+class RowTimeout(TimeoutError):
+    """La llamada superó ``row_timeout``; otros timeouts no usan esta clase."""
 
 
 @dataclass
 class TabularPromptRunner:
-    """Ejecuta un prompt sobre un dataset tabular agregando la respuesta del modelo."""
+    """Ejecuta un prompt sobre un dataset tabular agregando la respuesta del modelo.
+
+    ``run`` procesa las filas pendientes y guarda el archivo; ``plan()`` es un
+    dry-run. ``last_plan`` y ``metrics`` describen la última ejecución.
+
+    - ``concurrency``: filas en paralelo con ``arun``.
+    - ``checkpoint``: journal JSONL para reanudar una ejecución interrumpida.
+    - ``chunk_size``: lee y despacha el archivo por bloques.
+    - ``coalesce_duplicates``: una llamada por entrada repetida en el bloque.
+    - ``incremental_save``: actualiza sólo las celdas modificadas del Excel.
+    - ``retry_policy``: reintentos de errores transitorios (red, 429, 5xx).
+    - ``only_failed``: sólo reenvía las filas con ``error_column``.
+    - ``shards``: reparte las filas entre procesos (ver ``run_sharded``).
+    - ``on_progress``/``metrics_path``: publican ``metrics`` periódicamente.
+    - ``pack_size``: varias filas por petición, como arreglo JSON.
+    - ``output_dtype``/``compact_input``: tipos compactos de salida y entrada.
+    - ``cascade``: escala de un modelo barato a uno más fuerte.
+
+    ``export_batch``/``ingest_batch`` usan la Batch API en lugar del modelo.
+    ``load_columns``, ``prepare_frame``, ``open_checkpoint``, ``new_metrics``,
+    ``plan_frame``, ``build_chain``, ``run_frame``/``frame_calls``,
+    ``updated_cells`` y ``close_checkpoint`` permiten componer runners (ver
+    ``MultiPromptRunner`` y ``run_sharded``).
+    """
 
     settings: Settings
     prompt: BasePromptTemplate
@@ -33,10 +111,229 @@ class TabularPromptRunner:
     overwrite: bool = False
     build_variables: Optional[RowMapper] = None
     response_parser: Optional[ResponseParser] = None
+    concurrency: int = 1
+    # Segundos por llamada: timeout del cliente y, en ``arun``, de la fila completa.
+    row_timeout: Optional[float] = None
+    checkpoint: bool = False
+    checkpoint_every: int = 50
+    checkpoint_interval: Optional[float] = 30.0
+    # Sólo acota la lectura: los bloques se conservan para guardar y devolver
+    # el DataFrame completo. ``async.py`` es el flujo que no acumula filas.
+    chunk_size: Optional[int] = None
+    coalesce_duplicates: bool = False
+    incremental_save: bool = False
+    # Por defecto ``<output_column>_ERROR``; la salida de una fila fallida queda vacía.
+    error_column: Optional[str] = None
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    only_failed: bool = False
+    # Los workers usan ``spawn``: ``build_variables``, ``response_parser`` y
+    # ``cascade`` deben poder serializarse con pickle. No admite ``chunk_size``.
+    shards: int = 1
+    on_progress: Optional[ProgressCallback] = None
+    metrics_path: Optional[Path] = None
+    metrics_interval: float = 5.0
+    # Las respuestas que falten en el arreglo se reenvían una a una.
+    pack_size: int = 1
+    output_dtype: Optional[Any] = None
+    compact_input: bool = False
+    cascade: Sequence[CascadeTier] = ()
+    last_plan: RunPlan = field(default_factory=empty_plan, init=False, repr=False)
+    metrics: RunMetrics = field(default_factory=RunMetrics, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.error_column is None:
+            self.error_column = f"{self.output_column}_ERROR"
+        if self.pack_size < 1:
+            raise ValueError("pack_size debe ser mayor o igual a 1.")
+        if self.cascade and self.pack_size > 1:
+            raise ValueError("cascade no es compatible con pack_size mayor a 1.")
+        if self.shards > 1 and self.chunk_size is not None:
+            raise ValueError(
+                "shards reparte el plan del archivo completo y no es compatible "
+                "con chunk_size."
+            )
+        if self.coalesce_duplicates and self.build_variables is not None:
+            raise ValueError(
+                "coalesce_duplicates agrupa por input_column y no es compatible "
+                "con build_variables."
+            )
 
     def run(self) -> pd.DataFrame:
-        df = load_dataframe(self.settings.data_file, header=self.settings.data_header)
+        if self.shards > 1:
+            return run_sharded(self)
+        if self.concurrency > 1:
+            return asyncio.run(self.arun())
+
+        journal = self._open_journal()
+        restored = self._replay_checkpoint(journal)
+        chain = self.build_chain()
+        frames: List[pd.DataFrame] = []
+        plans: List[RunPlan] = []
+        self.metrics = self.new_metrics()
+
+        try:
+            for df in self._iter_frames():
+                frames.append(df)
+                plan = self._plan_frame(df, self._restore_checkpoint(df, restored))
+                plans.append(plan)
+                self.metrics.add_planned(self._planned_calls(plan))
+                self.run_frame(df, plan, chain, journal)
+        finally:
+            self.last_plan = combine_plans(plans)
+            if journal is not None:
+                journal.flush()
+            self.metrics.emit()
+
+        return self._finish(frames, journal, restored)
+
+    async def arun(self) -> pd.DataFrame:
+        """Versión asíncrona de ``run`` con concurrencia acotada por ``concurrency``."""
+        journal = self._open_journal()
+        restored = self._replay_checkpoint(journal)
+        chain = self.build_chain()
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        frames: List[pd.DataFrame] = []
+        in_flight: Set[asyncio.Task] = set()
+        # Limita cuántas filas se leen por delante de las que ya se enviaron.
+        max_in_flight = max(self.concurrency, self.chunk_size or 0) * 2
+        plans: List[RunPlan] = []
+        self.metrics = self.new_metrics()
+
+        # Cada tarea escribe en su propia fila por índice, así que el orden de
+        # llegada de las respuestas no altera el orden del DataFrame.
+        frame_iterator = self._iter_frames()
+        try:
+            while True:
+                # La lectura del siguiente bloque corre en un hilo mientras las
+                # filas ya leídas siguen enviándose.
+                df = await asyncio.to_thread(next, frame_iterator, None)
+                if df is None:
+                    break
+                frames.append(df)
+                plan = self._plan_frame(df, self._restore_checkpoint(df, restored))
+                plans.append(plan)
+                self.metrics.add_planned(self._planned_calls(plan))
+                await submit_bounded(
+                    self.frame_calls(df, plan, chain, semaphore, journal),
+                    in_flight,
+                    max_in_flight,
+                )
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            self.last_plan = combine_plans(plans)
+            for task in in_flight:
+                task.cancel()
+            if journal is not None:
+                journal.flush()
+            self.metrics.emit()
+
+        return self._finish(frames, journal, restored)
+
+    def plan(self) -> RunPlan:
+        """Dry-run: cuenta las filas a enviar, omitir o dejar intactas sin llamar al modelo."""
+        journal = self._open_journal()
+        restored = self._replay_checkpoint(journal)
+        return combine_plans(
+            [
+                self._plan_frame(df, self._restore_checkpoint(df, restored))
+                for df in self._iter_frames(cache=self.settings.data_cache)
+            ]
+        )
+
+    def export_batch(self, path: Path) -> RunPlan:
+        """Escribe las peticiones pendientes en ``path`` con el formato de la Batch API."""
+        journal = self._open_journal()
+        restored = self._replay_checkpoint(journal)
+        plans: List[RunPlan] = []
 
+        def requests():
+            for df in self._iter_frames(cache=self.settings.data_cache):
+                plan = self._plan_frame(df, self._restore_checkpoint(df, restored))
+                plans.append(plan)
+                for indices, variables in self._iter_pending(df, plan):
+                    yield build_batch_request(
+                        row_custom_id(indices[0]),
+                        self.prompt.format_prompt(**variables).to_messages(),
+                        model=self.settings.model_name,
+                        temperature=self.settings.temperature,
+                    )
+
+        write_batch_requests(path, requests())
+        self.last_plan = combine_plans(plans)
+        return self.last_plan
+
+    def ingest_batch(self, path: Path) -> pd.DataFrame:
+        """Aplica un archivo de resultados de la Batch API y guarda el dataset."""
+        results = read_batch_results(path)
+        journal = self._open_journal()
+        restored = self._replay_checkpoint(journal)
+        frames: List[pd.DataFrame] = []
+        plans: List[RunPlan] = []
+
+        # La agrupación de duplicados se recalcula igual que al exportar, así
+        # que el resultado de la primera fila de cada grupo vale para todas.
+        for df in self._iter_frames():
+            frames.append(df)
+            plan = self._plan_frame(df, self._restore_checkpoint(df, restored))
+            plans.append(plan)
+            for indices, _ in self._iter_pending(df, plan):
+                result = results.get(row_custom_id(indices[0]))
+                if result is None:
+                    continue
+                if result.error is not None:
+                    self._store_error(df, indices, BatchRequestError(result.error))
+                else:
+                    value = self._extract_content(AIMessage(content=result.content))
+                    self._store_result(df, indices, value, journal)
+
+        self.last_plan = combine_plans(plans)
+        if journal is not None:
+            journal.flush()
+        return self._finish(frames, journal, restored)
+
+    def _iter_frames(self, *, cache: bool = False) -> Iterator[pd.DataFrame]:
+        """Bloques del archivo de datos ya preparados.
+
+        ``cache`` sólo se activa en las lecturas que no reescriben el archivo
+        (``plan``, ``export_batch``): al guardar cambia su fecha y el cache
+        dejaría de servir, así que generarlo sólo costaría el pickle.
+        """
+        if self.chunk_size is None:
+            yield self.prepare_frame(
+                load_dataframe(
+                    self.settings.data_file,
+                    header=self.settings.data_header,
+                    columns=self.load_columns(),
+                    cache=cache,
+                )
+            )
+            return
+        for chunk in iter_dataframe_chunks(
+            self.settings.data_file,
+            header=self.settings.data_header,
+            chunk_size=self.chunk_size,
+            cache=cache,
+        ):
+            yield self.prepare_frame(chunk)
+
+    def load_columns(self) -> Optional[List[Any]]:
+        """Columnas a leer, o ``None`` para todas.
+
+        Sólo se omiten columnas cuando el guardado actualiza celdas en el
+        archivo existente; un guardado completo lo reescribiría sin ellas.
+        """
+        if (
+            not self.incremental_save
+            or not supports_write_back(self.settings.data_file)
+            or self.settings.data_header is None
+            or self.build_variables is not None
+        ):
+            return None
+        return [self.input_column, self.output_column, self.error_column]
+
+    def prepare_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Nombra las columnas de entrada y crea las de salida y error."""
         if self.input_column not in df.columns:
             rename_numeric_columns(df, {0: self.input_column})
 
@@ -46,39 +343,423 @@ class TabularPromptRunner:
         ):
             rename_numeric_columns(df, {1: self.settings.answer_column})
 
-        ensure_column_exists(df, self.output_column, default_value=None)
+        if self.compact_input:
+            compact_text_columns(df, [self.input_column])
+        # Una columna vacía se lee como float64 y no admite texto: sin un tipo
+        # declarado se usa ``object``.
+        ensure_column_exists(df, self.output_column, dtype=self.output_dtype or object)
+        ensure_column_exists(df, self.error_column, dtype=text_dtype() or object)
+        return df
+
+    def build_chain(self, llm: Optional[BaseChatModel] = None):
+        """``prompt | llm`` (o la cascada); ``llm`` permite compartir el cliente."""
+        if self.cascade:
+            return CascadeChain(
+                tiers=self.cascade,
+                chains=[
+                    self.prompt
+                    | build_chat_model(
+                        self.settings,
+                        model_name=tier.model_name,
+                        temperature=tier.temperature,
+                        max_retries=CLIENT_MAX_RETRIES,
+                        timeout=self.row_timeout,
+                    )
+                    for tier in self.cascade
+                ],
+            )
+        if llm is None:
+            llm = build_chat_model(
+                self.settings, max_retries=CLIENT_MAX_RETRIES, timeout=self.row_timeout
+            )
+        return self.prompt | llm
 
-        llm = build_chat_model(self.settings)
-        chain = self.prompt | llm
+    def _planned_calls(self, plan: RunPlan) -> int:
+        return math.ceil(plan.calls / self.pack_size)
 
-        for index, row in iter_rows(df, skip_rows=self.skip_rows):
-            existing_value = row.get(self.output_column)
-            if not self.overwrite and pd.notna(existing_value):
-                continue
+    def new_metrics(self, shard: Optional[int] = None) -> RunMetrics:
+        """Métricas vacías; con ``shard`` escriben en el archivo de ese shard."""
+        return RunMetrics(
+            callback=self.on_progress,
+            path=None if self.metrics_path is None else metrics_path_for(self.metrics_path, shard),
+            interval=self.metrics_interval,
+        )
 
-            question_value = row.get(self.input_column)
-            if pd.isna(question_value):
-                continue
+    def _open_journal(self, shard: Optional[int] = None) -> Optional[ProgressJournal]:
+        if not self.checkpoint:
+            return None
+        return ProgressJournal(
+            journal_path_for(self.settings.data_file, self.output_column, shard=shard),
+            flush_every=self.checkpoint_every,
+            flush_interval=self.checkpoint_interval,
+        )
+
+    def _replay_checkpoint(self, journal: Optional[ProgressJournal]) -> Dict[Any, Any]:
+        if journal is None:
+            return {}
+        restored = journal.replay()
+        # Journals de una ejecución por shards que se interrumpió.
+        for path in shard_journal_paths(self.settings.data_file, self.output_column):
+            restored.update(ProgressJournal(path).replay())
+        return restored
 
-            variables = (
-                self.build_variables(row)
-                if self.build_variables is not None
-                else {self.prompt_variable: question_value}
+    def open_checkpoint(
+        self, *, shard: Optional[int] = None
+    ) -> Tuple[Optional[ProgressJournal], Dict[Any, Any]]:
+        """Abre el journal (``None`` sin ``checkpoint``) y devuelve las respuestas ya anotadas.
+
+        Con ``shard`` abre el journal propio de ese worker sin reaplicar nada:
+        el proceso principal ya aplicó las respuestas anotadas.
+        """
+        journal = self._open_journal(shard=shard)
+        if shard is not None:
+            return journal, {}
+        return journal, self._replay_checkpoint(journal)
+
+    def close_checkpoint(self, journal: Optional[ProgressJournal]) -> None:
+        """Borra el journal una vez guardado el archivo."""
+        if journal is None:
+            return
+        journal.discard()
+        for path in shard_journal_paths(self.settings.data_file, self.output_column):
+            path.unlink(missing_ok=True)
+
+    def _restore_checkpoint(self, df: pd.DataFrame, restored: Mapping[Any, Any]) -> Set[Any]:
+        completed: Set[Any] = set()
+        for index, value in restored.items():
+            if index in df.index:
+                df.at[index, self.output_column] = value
+                completed.add(index)
+        return completed
+
+    def _store_result(
+        self,
+        df: pd.DataFrame,
+        indices: Sequence[Any],
+        value: Any,
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        for index in indices:
+            df.at[index, self.output_column] = value
+            df.at[index, self.error_column] = None
+            if journal is not None:
+                journal.record(index, value)
+
+    def _store_error(self, df: pd.DataFrame, indices: Sequence[Any], exc: BaseException) -> None:
+        if isinstance(exc, RowTimeout):
+            message = f"Timeout: sin respuesta tras {self.row_timeout} s"
+        else:
+            message = f"{type(exc).__name__}: {exc}"
+        # Con ``overwrite`` la fila podía tener una respuesta anterior: una
+        # salida que no corresponde a esta ejecución no debe contar como hecha.
+        df.loc[indices, self.output_column] = None
+        df.loc[indices, self.error_column] = message
+
+    def _finish(
+        self,
+        frames: List[pd.DataFrame],
+        journal: Optional[ProgressJournal],
+        restored: Mapping[Any, Any],
+    ) -> pd.DataFrame:
+        if not frames:
+            df = pd.DataFrame(columns=[self.input_column, self.output_column])
+        else:
+            df = frames[0] if len(frames) == 1 else pd.concat(frames)
+
+        if self.incremental_save:
+            write_back_columns(
+                df,
+                self.settings.data_file,
+                self.updated_cells(df, restored),
+                header=self.settings.data_header,
             )
+        else:
+            save_dataframe(df, self.settings.data_file)
+        self.close_checkpoint(journal)
+        return df
+
+    def updated_cells(self, df: pd.DataFrame, restored: Mapping[Any, Any]) -> Dict[str, pd.Index]:
+        """Filas modificadas de la columna de salida y la de error, para ``write_back_columns``."""
+        changed = self.last_plan.to_send.union(pd.Index(list(restored)))
+        changed = changed.intersection(df.index)
+        return {self.output_column: changed, self.error_column: changed}
+
+    def plan_frame(self, df: pd.DataFrame, restored: Mapping[Any, Any]) -> RunPlan:
+        """Aplica a ``df`` las respuestas del journal y planifica sus filas.
+
+        El plan queda en ``last_plan`` y sus llamadas se suman a ``metrics``.
+        """
+        plan = self._plan_frame(df, self._restore_checkpoint(df, restored))
+        self.last_plan = plan
+        self.metrics.add_planned(self._planned_calls(plan))
+        return plan
+
+    def _plan_frame(self, df: pd.DataFrame, completed: Set[Any]) -> RunPlan:
+        return plan_rows(
+            df,
+            input_column=self.input_column,
+            output_column=self.output_column,
+            skip_rows=self.skip_rows,
+            overwrite=self.overwrite,
+            completed=completed,
+            coalesce_duplicates=self.coalesce_duplicates,
+            failed_column=self.error_column if self.only_failed else None,
+        )
+
+    def _iter_pending(
+        self,
+        df: pd.DataFrame,
+        plan: RunPlan,
+    ) -> Iterator[PendingRow]:
+        if self.build_variables is not None:
+            for indices in plan.iter_groups():
+                yield indices, self.build_variables(df.loc[indices[0]])
+            return
+
+        # Cada grupo se envía con el texto original de su primera fila.
+        column = df[self.input_column]
+        for indices in plan.iter_groups():
+            yield indices, {self.prompt_variable: column.at[indices[0]]}
+
+    def _extract_content(self, response: Any) -> Any:
+        return (
+            self.response_parser(response)
+            if self.response_parser is not None
+            else getattr(response, "content", response)
+        )
+
+    def run_frame(
+        self,
+        df: pd.DataFrame,
+        plan: RunPlan,
+        chain,
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        if self.pack_size > 1:
+            for pack in iter_packs(self._iter_pending(df, plan), self.pack_size):
+                self._run_pack(df, pack, chain, journal)
+            return
+        for indices, variables in self._iter_pending(df, plan):
+            self._run_row(df, indices, chain, variables, journal)
+
+    def frame_calls(
+        self,
+        df: pd.DataFrame,
+        plan: RunPlan,
+        chain,
+        semaphore: asyncio.Semaphore,
+        journal: Optional[ProgressJournal],
+    ) -> Iterator[Awaitable[None]]:
+        """Una corrutina por llamada al modelo: una fila o un paquete de filas."""
+        if self.pack_size > 1:
+            for pack in iter_packs(self._iter_pending(df, plan), self.pack_size):
+                yield self._arun_pack(df, pack, chain, semaphore, journal)
+            return
+        for indices, variables in self._iter_pending(df, plan):
+            yield self._arun_row(df, indices, chain, variables, semaphore, journal)
+
+    def _run_row(
+        self,
+        df: pd.DataFrame,
+        indices: List[Any],
+        chain,
+        variables: Dict[str, Any],
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        metrics = self.metrics
+
+        def request(target, timer: Optional[ModelTimer] = None):
+            def attempt():
+                with metrics.track_request(), _measured(timer):
+                    return target.invoke(variables)
+
+            return self.retry_policy.call(attempt, on_retry=metrics.record_retry)
+
+        cascade = isinstance(chain, CascadeChain)
+        started = time.monotonic()
+        try:
+            if cascade:
+                outcome = chain.run(request, self._extract_content, metrics.record_tier)
+            else:
+                outcome = request(chain)
+        except Exception as exc:
+            self._store_error(df, indices, exc)
+            metrics.row_finished(len(indices), time.monotonic() - started, failed=True)
+            return
 
-            try:
-                response = chain.invoke(variables)
-            except Exception as exc:  # pragma: no cover - logging/managing errors
-                df.at[index, self.output_column] = f"Error: {exc}"
+        value = outcome if cascade else self._extract_content(outcome)
+        self._store_result(df, indices, value, journal)
+        metrics.row_finished(len(indices), time.monotonic() - started, failed=False)
+
+    async def _arun_row(
+        self,
+        df: pd.DataFrame,
+        indices: List[Any],
+        chain,
+        variables: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        metrics = self.metrics
+        # La latencia se mide desde que la fila obtiene su primer turno en el
+        # semáforo, no desde que se encoló.
+        started: Optional[float] = None
+
+        async def request(target, timer: Optional[ModelTimer] = None):
+            async def attempt():
+                nonlocal started
+                # El semáforo se libera durante la espera entre reintentos.
+                async with semaphore:
+                    if started is None:
+                        started = time.monotonic()
+                    with metrics.track_request(), _measured(timer):
+                        return await self._within_row_timeout(target.ainvoke(variables))
+
+            return await self.retry_policy.acall(attempt, on_retry=metrics.record_retry)
+
+        cascade = isinstance(chain, CascadeChain)
+        try:
+            if cascade:
+                outcome = await chain.arun(request, self._extract_content, metrics.record_tier)
+            else:
+                outcome = await request(chain)
+        except Exception as exc:
+            self._store_error(df, indices, exc)
+            metrics.row_finished(len(indices), _elapsed(started), failed=True)
+            return
+
+        value = outcome if cascade else self._extract_content(outcome)
+        self._store_result(df, indices, value, journal)
+        metrics.row_finished(len(indices), _elapsed(started), failed=False)
+
+    async def _within_row_timeout(self, call: Awaitable[Any]) -> Any:
+        # Sólo el límite propio se convierte en ``RowTimeout``; un timeout del
+        # cliente o del transporte se relanza tal cual.
+        deadline = asyncio.timeout(self.row_timeout)
+        try:
+            async with deadline:
+                return await call
+        except TimeoutError as exc:
+            if deadline.expired():
+                raise RowTimeout(self.row_timeout) from exc
+            raise
+
+    def _pack_chain(self, chain):
+        # ``chain`` es ``prompt | llm``; el paquete reutiliza el mismo modelo.
+        return PACK_PROMPT | chain.last
+
+    def _store_pack(
+        self,
+        df: pd.DataFrame,
+        pack: Sequence[PendingRow],
+        response: Any,
+        journal: Optional[ProgressJournal],
+        latency: float,
+    ) -> List[PendingRow]:
+        """Guarda las respuestas del paquete y devuelve las filas a reenviar una a una.
+
+        Un paquete que falló o del que no se leyó ninguna respuesta cuenta
+        como error; cada fila reenviada es una llamada más del plan.
+        """
+        answers = parse_packed_response(getattr(response, "content", response))
+        resolved = 0
+        missing: List[PendingRow] = []
+        for position, (indices, variables) in enumerate(pack, start=1):
+            answer = answers.get(str(position))
+            if answer is None:
+                missing.append((indices, variables))
                 continue
+            value = self._extract_content(AIMessage(content=answer))
+            self._store_result(df, indices, value, journal)
+            resolved += len(indices)
+        self.metrics.row_finished(resolved, latency, failed=resolved == 0)
+        self.metrics.add_planned(len(missing))
+        for _ in missing:
+            self.metrics.record_fallback()
+        return missing
+
+    def _run_pack(
+        self,
+        df: pd.DataFrame,
+        pack: List[PendingRow],
+        chain,
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        metrics = self.metrics
+        packed = self._pack_chain(chain)
+        pack_input = build_pack_input(self.prompt, [variables for _, variables in pack])
 
-            content = (
-                self.response_parser(response)
-                if self.response_parser is not None
-                else getattr(response, "content", response)
+        def attempt():
+            with metrics.track_request():
+                return packed.invoke(pack_input)
+
+        started = time.monotonic()
+        try:
+            response = self.retry_policy.call(attempt, on_retry=metrics.record_retry)
+        except Exception:
+            # Si el paquete falla entero, cada fila se intenta por separado.
+            response = None
+        missing = self._store_pack(df, pack, response, journal, time.monotonic() - started)
+        for indices, variables in missing:
+            self._run_row(df, indices, chain, variables, journal)
+
+    async def _arun_pack(
+        self,
+        df: pd.DataFrame,
+        pack: List[PendingRow],
+        chain,
+        semaphore: asyncio.Semaphore,
+        journal: Optional[ProgressJournal],
+    ) -> None:
+        metrics = self.metrics
+        packed = self._pack_chain(chain)
+        pack_input = build_pack_input(self.prompt, [variables for _, variables in pack])
+        started: Optional[float] = None
+
+        async def attempt():
+            nonlocal started
+            async with semaphore:
+                if started is None:
+                    started = time.monotonic()
+                with metrics.track_request():
+                    return await self._within_row_timeout(packed.ainvoke(pack_input))
+
+        try:
+            response = await self.retry_policy.acall(attempt, on_retry=metrics.record_retry)
+        except Exception:
+            response = None
+        missing = self._store_pack(df, pack, response, journal, _elapsed(started))
+        await asyncio.gather(
+            *(
+                self._arun_row(df, indices, chain, variables, semaphore, journal)
+                for indices, variables in missing
             )
-            df.at[index, self.output_column] = content
+        )
+
+
+async def submit_bounded(
+    calls: Iterable[Awaitable[None]],
+    in_flight: Set[asyncio.Task],
+    limit: int,
+) -> None:
+    """Crea una tarea por corrutina sin superar ``limit`` tareas en ``in_flight``.
+
+    Las corrutinas se consumen a medida que hay hueco, así que ``calls`` puede
+    ser un generador perezoso sobre todas las filas pendientes. ``in_flight``
+    se actualiza en el sitio para que el llamador pueda cancelar lo pendiente.
+    """
+    for call in calls:
+        while len(in_flight) >= limit:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            for task in done:
+                task.result()
+        in_flight.add(asyncio.create_task(call))
+
+
+def _measured(timer: Optional[ModelTimer]) -> ContextManager[None]:
+    return nullcontext() if timer is None else timer.measure()
 
-        save_dataframe(df, self.settings.data_file)
-        return df
 
+def _elapsed(started: Optional[float]) -> float:
+    return 0.0 if started is None else time.monotonic() - started
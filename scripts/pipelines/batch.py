@@ -0,0 +1,209 @@
+"""Modo batch sin conexión: exportar peticiones a JSONL e importar sus resultados.
+
+Los archivos siguen el formato de la Batch API de OpenAI: cada línea de
+entrada lleva ``custom_id``, ``method``, ``url`` y ``body``; cada línea de
+salida repite el ``custom_id`` junto a ``response`` o ``error``. El módulo
+incluye además un sustituto local que responde un archivo de entrada, para
+probar el ciclo completo sin la API::
+
+    uv run python -m scripts.pipelines.batch peticiones.jsonl resultados.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+BATCH_URL = "/v1/chat/completions"
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+Responder = Callable[[Dict[str, Any]], str]
+
+
+class BatchRequestError(RuntimeError):
+    """Error informado en el archivo de resultados para una petición."""
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """Respuesta (``content``) o motivo del fallo (``error``) de una petición."""
+
+    custom_id: str
+    content: Optional[str] = None
+    error: Optional[str] = None
+
+
+def row_custom_id(index: Any) -> str:
+    """Identificador de una fila del DataFrame dentro del archivo batch."""
+    return f"fila-{index}"
+
+
+def message_payload(messages: Sequence[BaseMessage]) -> List[Dict[str, Any]]:
+    return [
+        {"role": _ROLES.get(message.type, message.type), "content": message.content}
+        for message in messages
+    ]
+
+
+def build_batch_request(
+    custom_id: str,
+    messages: Sequence[BaseMessage],
+    *,
+    model: str,
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "model": model,
+        "temperature": temperature,
+        "messages": message_payload(messages),
+    }
+    if response_format is not None:
+        body["response_format"] = response_format
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_URL, "body": body}
+
+
+def write_batch_requests(path: Path, requests: Iterable[Dict[str, Any]]) -> int:
+    """Escribe las peticiones en ``path`` (una por línea) y devuelve cuántas hay."""
+    count = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        for request in requests:
+            handle.write(json.dumps(request, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    return count
+
+
+def read_batch_results(path: Path) -> Dict[str, BatchResult]:
+    """Lee un archivo de resultados y devuelve ``{custom_id: BatchResult}``."""
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el archivo de resultados en: {path}")
+
+    results: Dict[str, BatchResult] = {}
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            custom_id = record["custom_id"]
+            results[custom_id] = _parse_result(custom_id, record)
+    return results
+
+
+def _parse_result(custom_id: str, record: Dict[str, Any]) -> BatchResult:
+    error = record.get("error")
+    if error:
+        message = error.get("message") if isinstance(error, dict) else str(error)
+        return BatchResult(custom_id, error=message or "Error sin descripción")
+
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    status_code = response.get("status_code")
+    if status_code != 200:
+        detail = (body.get("error") or {}).get("message", "")
+        return BatchResult(custom_id, error=f"HTTP {status_code}: {detail}".strip(": "))
+
+    try:
+        content = body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return BatchResult(custom_id, error="Respuesta sin contenido")
+    return BatchResult(custom_id, content=content)
+
+
+def echo_responder(body: Dict[str, Any]) -> str:
+    """Responde con el último mensaje del usuario; sirve para pruebas sin red."""
+    messages = body.get("messages") or [{}]
+    return str(messages[-1].get("content", ""))
+
+
+def fulfill_batch_file(
+    requests_path: Path,
+    results_path: Path,
+    responder: Responder = echo_responder,
+) -> int:
+    """Sustituto local de la Batch API: responde cada petición con ``responder``."""
+    count = 0
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with requests_path.open("r", encoding="utf-8") as source, results_path.open(
+        "w", encoding="utf-8"
+    ) as target:
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            request = json.loads(line)
+            count += 1
+            target.write(json.dumps(_fulfill(request, responder, count), ensure_ascii=False) + "\n")
+    return count
+
+
+def _fulfill(request: Dict[str, Any], responder: Responder, number: int) -> Dict[str, Any]:
+    body = request.get("body") or {}
+    record: Dict[str, Any] = {
+        "id": f"batch_req_local_{number}",
+        "custom_id": request["custom_id"],
+        "response": None,
+        "error": None,
+    }
+    try:
+        content = responder(body)
+    except Exception as exc:
+        record["error"] = {"code": type(exc).__name__, "message": str(exc)}
+        return record
+    record["response"] = {
+        "status_code": 200,
+        "request_id": f"local_{number}",
+        "body": {
+            "id": f"chatcmpl-local-{number}",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+        },
+    }
+    return record
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Opciones ``--export-batch`` e ``--ingest-batch`` compartidas por los scripts."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--export-batch",
+        type=Path,
+        metavar="JSONL",
+        help="Escribe las peticiones pendientes en formato Batch API sin llamar al modelo.",
+    )
+    group.add_argument(
+        "--ingest-batch",
+        type=Path,
+        metavar="JSONL",
+        help="Incorpora un archivo de resultados de la Batch API al archivo de datos.",
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Responde localmente un archivo de peticiones batch (eco del último mensaje)."
+    )
+    parser.add_argument("requests", type=Path)
+    parser.add_argument("results", type=Path)
+    args = parser.parse_args(argv)
+    count = fulfill_batch_file(args.requests, args.results)
+    print(f"{count} peticiones respondidas en {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Cascada de modelos: primero uno barato y sólo se escala lo que no se acepta."""
+
+from __future__ import annotations
+
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, Sequence
+
+from langchain_core.runnables import Runnable
+
+AcceptanceCheck = Callable[[Any], bool]
+TierRecorder = Callable[[str, float, str], None]
+
+# Frases habituales cuando el modelo no responde a la pregunta. Sólo se buscan
+# al principio de la respuesta: una disculpa o un "no puedo" más adelante suele
+# ser parte de una respuesta válida (por ejemplo, las de friendly.py).
+REFUSAL_PATTERN = re.compile(
+    r"\b(no puedo|no tengo (?:informaci[oó]n|acceso)|como (?:un )?modelo de lenguaje"
+    r"|i can(?:no|')t|as an ai)\b",
+    re.IGNORECASE,
+)
+REFUSAL_WINDOW = 80
+
+ACCEPTED = "aceptadas"
+REJECTED = "rechazadas"
+FAILED = "errores"
+
+
+# Las comprobaciones son clases (no closures) para que los runners con
+# ``shards`` puedan enviarlas a otros procesos.
+@dataclass(frozen=True)
+class MinLength:
+    """Acepta respuestas de texto con al menos ``characters`` caracteres útiles."""
+
+    characters: int
+
+    def __call__(self, value: Any) -> bool:
+        return isinstance(value, str) and len(value.strip()) >= self.characters
+
+
+def not_refusal(value: Any) -> bool:
+    """Rechaza respuestas que empiezan como una negativa del modelo."""
+    return not (
+        isinstance(value, str) and REFUSAL_PATTERN.search(value.lstrip()[:REFUSAL_WINDOW])
+    )
+
+
+def is_parsed(value: Any) -> bool:
+    """Para ``response_parser`` que devuelven ``None`` cuando la respuesta no es válida."""
+    if isinstance(value, tuple):
+        return all(item is not None for item in value)
+    return value is not None
+
+
+class AllOf:
+    """Acepta sólo si todas las comprobaciones aceptan."""
+
+    def __init__(self, *checks: AcceptanceCheck) -> None:
+        self.checks = checks
+
+    def __call__(self, value: Any) -> bool:
+        return all(check(value) for check in self.checks)
+
+
+DEFAULT_ACCEPTANCE = AllOf(MinLength(2), not_refusal)
+
+
+@dataclass(frozen=True)
+class CascadeTier:
+    """Un modelo de la cascada y la comprobación que deben pasar sus respuestas.
+
+    La comprobación del último nivel no se evalúa: su respuesta se acepta
+    siempre porque no hay un modelo más fuerte al que escalar.
+    """
+
+    model_name: str
+    accept: AcceptanceCheck = DEFAULT_ACCEPTANCE
+    temperature: Optional[float] = None
+
+    def label(self, position: int) -> str:
+        return f"{position + 1}-{self.model_name}"
+
+
+def build_cascade(
+    model_names: Sequence[str],
+    accept: AcceptanceCheck = DEFAULT_ACCEPTANCE,
+) -> List[CascadeTier]:
+    """Niveles en el orden dado (del más barato al más fuerte) con la misma comprobación."""
+    return [CascadeTier(model_name=name, accept=accept) for name in model_names]
+
+
+class ModelTimer:
+    """Suma el tiempo pasado dentro de las llamadas al modelo.
+
+    Excluye la espera por el semáforo y entre reintentos, así la latencia por
+    nivel refleja sólo al modelo.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.seconds += time.monotonic() - started
+
+
+@dataclass
+class CascadeChain:
+    """Cadenas de cada nivel; ``run``/``arun`` devuelven el valor ya parseado."""
+
+    tiers: Sequence[CascadeTier]
+    chains: Sequence[Runnable]
+
+    def run(
+        self,
+        call: Callable[[Runnable, ModelTimer], Any],
+        parse: Callable[[Any], Any],
+        record: TierRecorder,
+    ) -> Any:
+        """``call(chain, timer)`` hace la petición (con reintentos) a la cadena de un nivel.
+
+        ``call`` debe envolver cada intento en ``timer.measure()``.
+        """
+        last = len(self.chains) - 1
+        for position, (tier, chain) in enumerate(zip(self.tiers, self.chains)):
+            timer = ModelTimer()
+            try:
+                value = parse(call(chain, timer))
+            except Exception:
+                record(tier.label(position), timer.seconds, FAILED)
+                if position == last:
+                    raise
+                continue
+            if self._accepts(position, tier, value, timer, record):
+                return value
+        raise AssertionError("unreachable")  # pragma: no cover - el último nivel siempre acepta
+
+    async def arun(
+        self,
+        call: Callable[[Runnable, ModelTimer], Awaitable[Any]],
+        parse: Callable[[Any], Any],
+        record: TierRecorder,
+    ) -> Any:
+        last = len(self.chains) - 1
+        for position, (tier, chain) in enumerate(zip(self.tiers, self.chains)):
+            timer = ModelTimer()
+            try:
+                value = parse(await call(chain, timer))
+            except Exception:
+                record(tier.label(position), timer.seconds, FAILED)
+                if position == last:
+                    raise
+                continue
+            if self._accepts(position, tier, value, timer, record):
+                return value
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _accepts(
+        self,
+        position: int,
+        tier: CascadeTier,
+        value: Any,
+        timer: ModelTimer,
+        record: TierRecorder,
+    ) -> bool:
+        accepted = position == len(self.chains) - 1 or bool(tier.accept(value))
+        record(tier.label(position), timer.seconds, ACCEPTED if accepted else REJECTED)
+        return accepted
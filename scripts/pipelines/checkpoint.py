@@ -0,0 +1,97 @@
+"""Journal de progreso para reanudar ejecuciones tabulares interrumpidas."""
+
+from __future__ import annotations
+
+import glob
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def journal_path_for(data_file: Path, column: str, *, shard: Optional[int] = None) -> Path:
+    """Devuelve la ruta del journal asociado a ``data_file`` y ``column``.
+
+    Las ejecuciones por shards usan un journal por proceso (``shard``).
+    """
+    suffix = "" if shard is None else f".shard{shard}"
+    return data_file.with_name(f"{data_file.name}.{column}{suffix}.journal.jsonl")
+
+
+def shard_journal_paths(data_file: Path, column: str) -> List[Path]:
+    """Devuelve los journals por shard que existan para ``data_file`` y ``column``."""
+    pattern = f"{glob.escape(data_file.name)}.{glob.escape(column)}.shard*.journal.jsonl"
+    return sorted(data_file.parent.glob(pattern))
+
+
+def _json_key(index: Any) -> Any:
+    # Los índices de pandas suelen ser numpy.int64, que json no serializa.
+    return index.item() if hasattr(index, "item") else index
+
+
+class ProgressJournal:
+    """Registro append-only (JSONL) de las filas ya resueltas.
+
+    Las entradas se acumulan en memoria y se escriben al disco cada
+    ``flush_every`` filas o cada ``flush_interval`` segundos, lo que ocurra
+    primero.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        flush_every: int = 50,
+        flush_interval: Optional[float] = 30.0,
+    ) -> None:
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+
+    def replay(self) -> Dict[Any, Any]:
+        """Lee el journal existente y devuelve ``{índice: valor}``."""
+        entries: Dict[Any, Any] = {}
+        if not self.path.exists():
+            return entries
+        with self.path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Una línea truncada por una caída a mitad de escritura.
+                    continue
+                entries[record["index"]] = record["value"]
+        return entries
+
+    def record(self, index: Any, value: Any) -> None:
+        self._buffer.append(
+            json.dumps(
+                {"index": _json_key(index), "value": value},
+                ensure_ascii=False,
+                default=str,
+            )
+        )
+        if len(self._buffer) >= self.flush_every or self._interval_elapsed():
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def discard(self) -> None:
+        """Elimina el journal una vez que el resultado final quedó guardado."""
+        self._buffer.clear()
+        self.path.unlink(missing_ok=True)
+
+    def _interval_elapsed(self) -> bool:
+        if self.flush_interval is None:
+            return False
+        return time.monotonic() - self._last_flush >= self.flush_interval
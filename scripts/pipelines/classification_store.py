@@ -0,0 +1,121 @@
+"""Clasificaciones ya calculadas, indexadas por el hash del texto clasificado."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Sequence, Tuple
+
+Classification = Tuple[int, str]
+
+# SQLite admite hasta 999 parámetros por consulta en versiones antiguas.
+_LOOKUP_BATCH = 500
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(text: str) -> str:
+    """Hash del texto tras normalizar Unicode y espacios; ignora cambios de formato."""
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def prompt_version(*parts: Any) -> str:
+    """Versión corta derivada del prompt y de la configuración que cambia la respuesta."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+class ClassificationStore:
+    """Tabla SQLite ``hash -> (puntaje, sentimiento, modelo, versión del prompt)``.
+
+    ``lookup`` sólo devuelve entradas del mismo modelo y versión del prompt:
+    si alguno cambia, todas las opiniones se vuelven a clasificar y ``save``
+    reemplaza las entradas anteriores.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " hash TEXT PRIMARY KEY,"
+            " score INTEGER NOT NULL,"
+            " sentiment TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def lookup(
+        self,
+        hashes: Sequence[str],
+        *,
+        model: str,
+        prompt_version: str,
+    ) -> Dict[str, Classification]:
+        """Clasificaciones guardadas para ``hashes`` con el mismo modelo y prompt.
+
+        Los contadores ``hits``/``misses`` cuentan filas, no hashes distintos.
+        """
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, Classification] = {}
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start : start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    "SELECT hash, score, sentiment FROM classifications"
+                    f" WHERE hash IN ({placeholders}) AND model = ? AND prompt_version = ?",
+                    (*batch, model, prompt_version),
+                ).fetchall()
+                found.update({row[0]: (row[1], row[2]) for row in rows})
+            reused = sum(hash_ in found for hash_ in hashes)
+            self.hits += reused
+            self.misses += len(hashes) - reused
+        return found
+
+    def save(
+        self,
+        classifications: Iterable[Tuple[str, int, str]],
+        *,
+        model: str,
+        prompt_version: str,
+    ) -> None:
+        """Guarda ``(hash, puntaje, sentimiento)`` en una sola transacción."""
+        now = time.time()
+        rows = [
+            (hash_, int(score), str(sentiment), model, prompt_version, now)
+            for hash_, score, sentiment in classifications
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO classifications"
+                " (hash, score, sentiment, model, prompt_version, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM classifications"
+            ).fetchone()
+        return {"reutilizadas": self.hits, "nuevas": self.misses, "entradas": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
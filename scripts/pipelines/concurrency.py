@@ -0,0 +1,214 @@
+"""Límite de concurrencia adaptativo (AIMD) para llamadas asíncronas al modelo.
+
+El límite sube de a poco (suma) mientras la latencia y los errores se
+mantienen sanos y baja de golpe (multiplica) ante respuestas 429, timeouts,
+una tasa de errores alta o un p95 que crece respecto de su referencia.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import openai
+
+from scripts.pipelines.metrics import percentile
+
+DecisionCallback = Callable[[Dict[str, Any]], None]
+
+INCREASE = "aumento"
+DECREASE = "reduccion"
+# Tras una reducción por latencia, un p95 que no baja al menos un 10 % indica
+# que la latencia no depende de la concurrencia.
+CUT_EFFECT = 0.9
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """429 y timeouts indican que el servicio está saturado."""
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, openai.APITimeoutError)):
+        return True
+    return getattr(exc, "status_code", None) == 429
+
+
+def print_decision(decision: Dict[str, Any]) -> None:
+    """Callback sencillo que muestra cada cambio del límite por consola."""
+    print(
+        f"[concurrencia] {decision['desde']} -> {decision['hasta']} ({decision['motivo']})"
+        f" | p95 {decision['latencia_p95_s']} s | errores {decision['errores_pct']}%",
+        flush=True,
+    )
+
+
+class AdaptiveLimiter:
+    """Semáforo cuyo límite se ajusta con AIMD según las respuestas observadas.
+
+    Cada ventana de ``max(limit, min_samples)`` llamadas terminadas se evalúa:
+    si la tasa de errores supera ``max_error_rate`` o el p95 de la ventana
+    supera ``latency_tolerance`` veces la referencia, el límite se multiplica
+    por ``decrease``; si no, aumenta en ``increase``. Un 429 o un timeout
+    reduce el límite en el momento. Las llamadas que empezaron antes de la
+    última reducción no cuentan: reflejan el límite anterior.
+
+    La referencia de latencia es una media móvil del p95 de las ventanas
+    sanas; tras una reducción por latencia se acerca al p95 observado y, si la
+    reducción no bajó el p95 (o el límite ya está en ``minimum``), se toma el
+    p95 actual como nueva referencia en lugar de seguir reduciendo. Cada
+    cambio se guarda en ``decisions`` y se pasa a ``on_decision``.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 5,
+        minimum: int = 1,
+        maximum: int = 50,
+        increase: int = 1,
+        decrease: float = 0.5,
+        min_samples: int = 10,
+        max_error_rate: float = 0.1,
+        latency_tolerance: float = 1.5,
+        on_decision: Optional[DecisionCallback] = None,
+    ) -> None:
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("Se requiere 1 <= minimum <= initial <= maximum.")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease debe estar entre 0 y 1.")
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.on_decision = on_decision
+        self.in_flight = 0
+        self.baseline_p95: Optional[float] = None
+        self._p95_before_cut: Optional[float] = None
+        self.decisions: List[Dict[str, Any]] = []
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._last_decrease = float("-inf")
+        self._started = time.monotonic()
+        self._condition: Optional[asyncio.Condition] = None
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Espera un hueco bajo el límite y registra la latencia y el resultado."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        started = time.monotonic()
+        error: Optional[BaseException] = None
+        try:
+            yield
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                self._observe(started, time.monotonic() - started, error)
+                condition.notify_all()
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _observe(self, started: float, latency: float, error: Optional[BaseException]) -> None:
+        if started < self._last_decrease:
+            # Empezó con el límite anterior: ya se reaccionó a esa saturación.
+            return
+        if error is not None and is_overload_error(error):
+            reason = "429" if getattr(error, "status_code", None) == 429 else "timeout"
+            self._decide(DECREASE, reason)
+            return
+        if error is not None:
+            self._errors += 1
+        self._latencies.append(latency)
+        if len(self._latencies) >= max(self.limit, self.min_samples):
+            self._evaluate_window()
+
+    def _evaluate_window(self) -> None:
+        p95 = percentile(sorted(self._latencies), 0.95)
+        error_rate = self._errors / len(self._latencies)
+        if error_rate > self.max_error_rate:
+            self._decide(DECREASE, "tasa de errores", p95, error_rate)
+        elif self.baseline_p95 is not None and p95 > self.baseline_p95 * self.latency_tolerance:
+            if self.limit > self.minimum and not self._cut_did_not_help(p95):
+                self._p95_before_cut = p95
+                # La referencia se acerca al p95 observado: si la latencia subió
+                # por otra causa (opiniones más largas, otra región), las
+                # ventanas siguientes dejan de superar la tolerancia.
+                self.baseline_p95 = (self.baseline_p95 + p95) / 2
+                self._decide(DECREASE, "p95 en aumento", p95, error_rate)
+            else:
+                # Reducir ya no baja el p95: el cambio no depende de la carga.
+                self.baseline_p95 = p95
+                self._healthy_window(p95, error_rate)
+        else:
+            self._healthy_window(p95, error_rate)
+
+    def _cut_did_not_help(self, p95: float) -> bool:
+        return self._p95_before_cut is not None and p95 >= self._p95_before_cut * CUT_EFFECT
+
+    def _healthy_window(self, p95: float, error_rate: float) -> None:
+        self._p95_before_cut = None
+        self.baseline_p95 = p95 if self.baseline_p95 is None else 0.8 * self.baseline_p95 + 0.2 * p95
+        if self.limit < self.maximum:
+            self._decide(INCREASE, "ventana sana", p95, error_rate)
+        else:
+            self._reset_window()
+
+    def _decide(
+        self,
+        action: str,
+        reason: str,
+        p95: Optional[float] = None,
+        error_rate: Optional[float] = None,
+    ) -> None:
+        if p95 is None and self._latencies:
+            p95 = percentile(sorted(self._latencies), 0.95)
+        if error_rate is None:
+            error_rate = self._errors / max(len(self._latencies), 1)
+        previous = self.limit
+        if action == INCREASE:
+            self.limit = min(self.maximum, self.limit + self.increase)
+        else:
+            self.limit = max(self.minimum, math.floor(self.limit * self.decrease))
+            self._last_decrease = time.monotonic()
+        self._reset_window()
+        if self.limit == previous:
+            return
+        decision = {
+            "transcurrido_s": round(time.monotonic() - self._started, 3),
+            "accion": action,
+            "desde": previous,
+            "hasta": self.limit,
+            "motivo": reason,
+            "latencia_p95_s": None if p95 is None else round(p95, 3),
+            "referencia_p95_s": None if self.baseline_p95 is None else round(self.baseline_p95, 3),
+            "errores_pct": round(100 * error_rate, 1),
+        }
+        self.decisions.append(decision)
+        if self.on_decision is not None:
+            self.on_decision(decision)
+
+    def _reset_window(self) -> None:
+        self._latencies = []
+        self._errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limite_actual": self.limit,
+            "limite_maximo_alcanzado": max(
+                [self.limit] + [decision["hasta"] for decision in self.decisions]
+            ),
+            "aumentos": sum(decision["accion"] == INCREASE for decision in self.decisions),
+            "reducciones": sum(decision["accion"] == DECREASE for decision in self.decisions),
+        }
@@ -0,0 +1,139 @@
+"""Evaluación léxica de respuestas del modelo frente a respuestas de referencia.
+
+Todas las métricas se calculan sobre el DataFrame completo con operaciones de
+NumPy: cada texto se convierte en pares (fila, token) que actúan como una
+matriz dispersa en formato COO, y los productos y sumas por fila se resuelven
+con ``np.bincount`` en lugar de recorrer las filas.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = r"\w+"
+SCORE_SUFFIXES = {"f1": "_F1", "tfidf_cosine": "_TFIDF", "exact_match": "_EM"}
+
+
+def tokenize(texts: pd.Series) -> pd.Series:
+    """Listas de tokens en minúsculas y sin tildes (``NaN`` si no hay texto)."""
+    return (
+        # Almacenamiento "python": ``\w`` de ``re`` reconoce letras no ASCII.
+        texts.astype("string[python]")
+        .str.normalize("NFKD")
+        .str.replace("[\u0300-\u036f]", "", regex=True)
+        .str.casefold()
+        .str.findall(TOKEN_PATTERN)
+    )
+
+
+def _coo(tokens: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Pares (posición de la fila, token) de todas las filas."""
+    exploded = tokens.reset_index(drop=True).explode().dropna()
+    return exploded.index.to_numpy(dtype=np.int64), exploded.to_numpy(dtype=object)
+
+
+def _row_counts(keys: np.ndarray, size: int, weights: np.ndarray) -> np.ndarray:
+    return np.bincount(keys, weights=weights, minlength=size)
+
+
+def score_pairs(predictions: pd.Series, references: pd.Series) -> pd.DataFrame:
+    """Token F1, coseno TF-IDF y coincidencia exacta para cada par de textos.
+
+    Las filas sin predicción o sin referencia, o en las que ninguno de los
+    dos textos tiene tokens (por ejemplo ``"?"`` frente a ``"!"``), quedan
+    con ``NaN`` para no inflar las medias. El IDF se
+    calcula sobre todos los textos evaluados (predicciones y referencias).
+    """
+    size = len(predictions)
+    valid = (predictions.notna() & references.notna()).to_numpy()
+    pred_tokens = tokenize(predictions.where(valid))
+    ref_tokens = tokenize(references.where(valid))
+
+    rows_p, tokens_p = _coo(pred_tokens)
+    rows_r, tokens_r = _coo(ref_tokens)
+    codes, vocabulary = pd.factorize(np.concatenate([tokens_p, tokens_r]))
+    vocab_size = max(len(vocabulary), 1)
+    # Clave única por (fila, token): los conteos equivalen a una matriz dispersa.
+    keys_p, counts_p = np.unique(rows_p * vocab_size + codes[: len(tokens_p)], return_counts=True)
+    keys_r, counts_r = np.unique(rows_r * vocab_size + codes[len(tokens_p) :], return_counts=True)
+    row_p, token_p = np.divmod(keys_p, vocab_size)
+    row_r, token_r = np.divmod(keys_r, vocab_size)
+    common, in_p, in_r = np.intersect1d(keys_p, keys_r, assume_unique=True, return_indices=True)
+    common_rows = common // vocab_size
+
+    # Token F1 (solapamiento de bolsas de palabras).
+    length_p = _row_counts(row_p, size, counts_p)
+    length_r = _row_counts(row_r, size, counts_r)
+    overlap = _row_counts(common_rows, size, np.minimum(counts_p[in_p], counts_r[in_r]))
+    precision = np.divide(overlap, length_p, out=np.zeros(size), where=length_p > 0)
+    recall = np.divide(overlap, length_r, out=np.zeros(size), where=length_r > 0)
+    f1 = np.divide(
+        2 * precision * recall,
+        precision + recall,
+        out=np.zeros(size),
+        where=(precision + recall) > 0,
+    )
+    both_empty = (length_p == 0) & (length_r == 0)
+
+    # Coseno TF-IDF con IDF suavizado, como TfidfVectorizer de scikit-learn.
+    documents = int((length_p > 0).sum() + (length_r > 0).sum())
+    document_frequency = np.bincount(
+        np.concatenate([token_p, token_r]), minlength=vocab_size
+    )
+    idf = np.log((1 + documents) / (1 + document_frequency)) + 1
+    weights_p = counts_p * idf[token_p]
+    weights_r = counts_r * idf[token_r]
+    norm_p = np.sqrt(_row_counts(row_p, size, weights_p**2))
+    norm_r = np.sqrt(_row_counts(row_r, size, weights_r**2))
+    dot = _row_counts(common_rows, size, weights_p[in_p] * weights_r[in_r])
+    norms = norm_p * norm_r
+    cosine = np.divide(dot, norms, out=np.zeros(size), where=norms > 0)
+
+    exact = (
+        pred_tokens.str.join(" ").fillna("").to_numpy(dtype=object)
+        == ref_tokens.str.join(" ").fillna("").to_numpy(dtype=object)
+    ).astype(float)
+
+    scores = pd.DataFrame(
+        {"f1": f1, "tfidf_cosine": cosine, "exact_match": exact},
+        index=predictions.index,
+    )
+    scores.loc[~valid | both_empty] = np.nan
+    return scores.round(4)
+
+
+def evaluate_answers(
+    df: pd.DataFrame,
+    *,
+    reference_column: str,
+    answer_columns: Sequence[str],
+    skip_rows: int = 0,
+) -> pd.DataFrame:
+    """Añade columnas ``<columna>_F1``, ``_TFIDF`` y ``_EM`` y devuelve un resumen.
+
+    Las filas con índice menor que ``skip_rows`` no se evalúan. El resumen
+    tiene una fila por columna evaluada con el número de filas comparadas y
+    la media de cada métrica.
+    """
+    references = df[reference_column].where(df.index >= skip_rows)
+    summary: Dict[str, Dict[str, float]] = {}
+    for column in answer_columns:
+        scores = score_pairs(df[column], references)
+        for metric, suffix in SCORE_SUFFIXES.items():
+            df[f"{column}{suffix}"] = scores[metric]
+        summary[column] = {
+            "filas": int(scores["f1"].notna().sum()),
+            "f1_media": scores["f1"].mean(),
+            "f1_mediana": scores["f1"].median(),
+            "tfidf_media": scores["tfidf_cosine"].mean(),
+            "exact_match": scores["exact_match"].mean(),
+        }
+    return pd.DataFrame.from_dict(summary, orient="index").round(4)
+
+
+def score_columns(answer_columns: Sequence[str]) -> list:
+    """Nombres de las columnas de puntaje que ``evaluate_answers`` añade."""
+    return [f"{column}{suffix}" for column in answer_columns for suffix in SCORE_SUFFIXES.values()]
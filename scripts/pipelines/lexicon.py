@@ -0,0 +1,168 @@
+"""Clasificador local de sentimiento en español basado en un léxico.
+
+Sirve como primera etapa barata: asigna puntaje y sentimiento a las
+opiniones cortas y claras ("excelente servicio", "pésimo") y deja las
+ambiguas para el modelo. Todo el cálculo es vectorizado: los textos se
+parten en cláusulas, se tokenizan una vez, se explotan a pares (cláusula,
+token) y las sumas por fila se hacen con ``np.bincount``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.pipelines.evaluation import tokenize
+
+# Pesos de 1 (leve) a 3 (fuerte), sin tildes: ``tokenize`` las elimina.
+POSITIVE_WORDS: Dict[str, float] = {
+    "excelente": 3, "excelentes": 3, "genial": 3, "perfecto": 3, "perfecta": 3,
+    "fantastico": 3, "fantastica": 3, "maravilloso": 3, "maravillosa": 3,
+    "increible": 2, "encanta": 3, "encanto": 3, "espectacular": 3, "impecable": 3,
+    "buen": 2, "bueno": 2, "buena": 2, "buenos": 2, "buenas": 2, "mejor": 1,
+    "recomiendo": 2, "recomendable": 2, "amable": 2, "amables": 2, "atento": 1,
+    "atenta": 1, "feliz": 2, "contento": 2, "contenta": 2, "satisfecho": 2,
+    "satisfecha": 2, "rapido": 1, "rapida": 1, "facil": 1, "util": 1, "comodo": 1,
+    "agradable": 2, "gracias": 1, "correcto": 1, "bien": 1, "eficiente": 2,
+    "gusta": 2, "gusto": 2, "gustan": 2, "gustaron": 2,
+}
+NEGATIVE_WORDS: Dict[str, float] = {
+    "pesimo": 3, "pesima": 3, "horrible": 3, "terrible": 3, "fatal": 3,
+    "desastre": 3, "basura": 3, "estafa": 3, "malo": 2, "mala": 2, "malos": 2,
+    "malas": 2, "mal": 2, "peor": 2, "decepcion": 2, "decepcionado": 2,
+    "decepcionada": 2, "decepcionante": 2, "insatisfecho": 2, "insatisfecha": 2,
+    "defectuoso": 2, "defectuosa": 2, "roto": 2, "rota": 2, "molesto": 2,
+    "molesta": 2, "lento": 1, "lenta": 1, "caro": 1, "cara": 1, "problema": 1,
+    "problemas": 1, "error": 1, "errores": 1, "queja": 1, "tarde": 1,
+    "grosero": 2, "grosera": 2, "inutil": 2, "deficiente": 2,
+}
+# "nada" no está: tras el verbo es enfático ("no me gustó nada"), no niega lo que sigue.
+NEGATORS = frozenset({"no", "nunca", "jamas", "tampoco", "ni", "sin"})
+INTENSIFIERS = frozenset({"muy", "super", "bastante", "realmente", "tan", "demasiado"})
+
+# Una negación invierte los términos de las siguientes NEGATION_WINDOW
+# palabras de su cláusula ("no es muy bueno"), con algo menos de peso. Una
+# señal que sólo viene de términos negados es menos fiable: su confianza se
+# multiplica por NEGATED_CONFIDENCE.
+CLAUSE_BREAK = r"[,.;:!?¡¿()\[\]\n]+"
+NEGATION_WINDOW = 3
+NEGATION_WEIGHT = 0.8
+NEGATED_CONFIDENCE = 0.5
+INTENSIFIER_WEIGHT = 1.5
+# Masa neta de léxico con la que la señal se considera completa, y longitud
+# a partir de la cual la confianza baja (una palabra en un texto largo dice poco).
+FULL_MASS = 3.0
+SHORT_TEXT_TOKENS = 12
+
+
+def _lexicon_weights() -> Dict[str, float]:
+    weights = {word: float(value) for word, value in POSITIVE_WORDS.items()}
+    weights.update({word: -float(value) for word, value in NEGATIVE_WORDS.items()})
+    return weights
+
+
+def _preceded_by(flags: np.ndarray, groups: np.ndarray, window: int) -> np.ndarray:
+    """Marca los tokens con una marca de ``flags`` en las ``window`` posiciones previas de su grupo."""
+    result = np.zeros(len(flags), dtype=bool)
+    for shift in range(1, window + 1):
+        if shift >= len(flags):
+            break
+        result[shift:] |= flags[:-shift] & (groups[shift:] == groups[:-shift])
+    return result
+
+
+def score_opinions(
+    texts: pd.Series,
+    weights: Optional[Mapping[str, float]] = None,
+) -> pd.DataFrame:
+    """Puntaje (1-10), sentimiento y confianza (0-1) de cada texto.
+
+    La confianza combina la pureza de la señal (sólo positiva o sólo
+    negativa), su intensidad, la longitud del texto y cuánto depende de
+    negaciones; es 0 si no hay palabras del léxico. La negación y los
+    intensificadores no cruzan la puntuación ("no, excelente"). El índice del
+    resultado es el de ``texts``.
+    """
+    weights = _lexicon_weights() if weights is None else weights
+    size = len(texts)
+    clauses = (
+        pd.Series(texts.to_numpy(dtype=object), dtype="string[python]")
+        .str.split(CLAUSE_BREAK, regex=True)
+        .explode()
+    )
+    clause_rows = clauses.index.to_numpy(dtype=np.int64)
+    exploded = tokenize(clauses.reset_index(drop=True)).explode().dropna()
+    clause_ids = exploded.index.to_numpy(dtype=np.int64)
+    rows = clause_rows[clause_ids]
+    words = pd.Series(exploded.to_numpy(dtype=object))
+
+    values = words.map(weights).fillna(0.0).to_numpy(dtype=float)
+    negated = _preceded_by(words.isin(NEGATORS).to_numpy(), clause_ids, NEGATION_WINDOW)
+    intensified = _preceded_by(words.isin(INTENSIFIERS).to_numpy(), clause_ids, 1)
+    values = np.where(intensified, values * INTENSIFIER_WEIGHT, values)
+    values = np.where(negated, -values * NEGATION_WEIGHT, values)
+
+    tokens = np.bincount(rows, minlength=size)
+    positive = np.bincount(rows, weights=np.clip(values, 0, None), minlength=size)
+    negative = np.bincount(rows, weights=np.clip(-values, 0, None), minlength=size)
+    matches = np.bincount(rows, weights=(values != 0).astype(float), minlength=size)
+    negated_mass = np.bincount(rows, weights=np.abs(values) * negated, minlength=size)
+
+    mass = positive + negative
+    net = positive - negative
+    purity = np.divide(np.abs(net), mass, out=np.zeros(size), where=mass > 0)
+    strength = np.minimum(1.0, np.abs(net) / FULL_MASS)
+    brevity = np.minimum(1.0, np.divide(SHORT_TEXT_TOKENS, tokens, out=np.ones(size), where=tokens > 0))
+    negated_share = np.divide(negated_mass, mass, out=np.zeros(size), where=mass > 0)
+    confidence = purity * strength * brevity * (1 - (1 - NEGATED_CONFIDENCE) * negated_share)
+
+    score = np.clip(np.floor(5.5 + 4.5 * np.sign(net) * strength + 0.5), 1, 10)
+    sentiment = np.select([net > 0, net < 0], ["Positivo", "Negativo"], default="Neutro")
+    return pd.DataFrame(
+        {
+            "score": pd.array(score.astype(int), dtype="Int8"),
+            "sentiment": sentiment,
+            "confidence": confidence.round(3),
+            "matches": matches.astype(int),
+        },
+        index=texts.index,
+    )
+
+
+@dataclass
+class LexiconStats:
+    """Cuántas opiniones resolvió el léxico y cuánto coincide con el modelo."""
+
+    scored: int = 0
+    accepted: int = 0
+    sampled: int = 0
+    sentiment_matches: int = 0
+    score_error: float = 0.0
+
+    def compare(
+        self,
+        lexicon: Tuple[int, str],
+        score: Optional[int],
+        sentiment: Optional[str],
+    ) -> None:
+        """Compara la predicción del léxico con la del modelo para una opinión de la muestra."""
+        if score is None or sentiment is None:
+            return
+        lexicon_score, lexicon_sentiment = lexicon
+        self.sampled += 1
+        self.sentiment_matches += int(lexicon_sentiment == sentiment)
+        self.score_error += abs(int(lexicon_score) - int(score))
+
+    def summary(self) -> Dict[str, Any]:
+        sampled = max(self.sampled, 1)
+        return {
+            "evaluadas": self.scored,
+            "resueltas_por_lexico": self.accepted,
+            "enviadas_al_modelo": self.scored - self.accepted,
+            "muestra_comparada": self.sampled,
+            "coincidencia_sentimiento_pct": round(100 * self.sentiment_matches / sampled, 1),
+            "error_medio_puntaje": round(self.score_error / sampled, 2),
+        }
@@ -0,0 +1,189 @@
+"""Métricas en vivo (rendimiento, latencia, errores) de una ejecución tabular."""
+
+from __future__ import annotations
+
+import json
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Sequence
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Las percentiles se calculan sobre las últimas N latencias para reflejar
+# cambios de ritmo durante ejecuciones largas.
+LATENCY_WINDOW = 10_000
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una secuencia ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def metrics_path_for(path: Path, shard: Optional[int]) -> Path:
+    """Ruta de métricas de un shard: ``run.jsonl`` pasa a ``run.shard0.jsonl``."""
+    if shard is None:
+        return path
+    return path.with_name(f"{path.stem}.shard{shard}{path.suffix}")
+
+
+def print_progress(snapshot: Dict[str, Any]) -> None:
+    """Callback sencillo que muestra el progreso en una línea por consola."""
+    eta = snapshot["eta_s"]
+    print(
+        f"[progreso] {snapshot['llamadas_completadas']}/{snapshot['llamadas_planificadas']} llamadas"
+        f" | {snapshot['filas_por_segundo']} filas/s"
+        f" | en vuelo {snapshot['en_vuelo']}"
+        f" | p50/p95/p99 {snapshot['latencia_p50_s']}/{snapshot['latencia_p95_s']}"
+        f"/{snapshot['latencia_p99_s']} s"
+        f" | reintentos {snapshot['reintentos']} | errores {snapshot['errores']}"
+        f" | ETA {'-' if eta is None else f'{eta} s'}",
+        flush=True,
+    )
+    for tier, stats in snapshot.get("niveles", {}).items():
+        print(f"  [nivel {tier}] {stats}", flush=True)
+
+
+class TierMetrics:
+    """Conteos y latencias de un nivel de la cascada de modelos."""
+
+    def __init__(self) -> None:
+        self.outcomes: Dict[str, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency: float, outcome: str) -> None:
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.latencies.append(latency)
+
+    def merge(self, other: "TierMetrics") -> None:
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        self.latencies.extend(other.latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "llamadas": sum(self.outcomes.values()),
+            **self.outcomes,
+            "latencia_p50_s": _round(percentile(latencies, 0.50)),
+            "latencia_p95_s": _round(percentile(latencies, 0.95)),
+        }
+
+
+class RunMetrics:
+    """Acumula métricas de una ejecución y las publica cada ``interval`` segundos.
+
+    Se actualiza desde un único hilo (el bucle síncrono o el bucle de eventos),
+    así que no necesita locks. Cada publicación llama a ``callback`` con
+    ``snapshot()`` y, si hay ``path``, añade el snapshot como línea JSON.
+    """
+
+    def __init__(
+        self,
+        *,
+        callback: Optional[ProgressCallback] = None,
+        path: Optional[Path] = None,
+        interval: float = 5.0,
+    ) -> None:
+        self.callback = callback
+        self.path = path
+        self.interval = interval
+        self.planned_calls = 0
+        self.completed_calls = 0
+        self.completed_rows = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.tiers: Dict[str, TierMetrics] = {}
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._started = time.monotonic()
+        self._last_emit = self._started
+
+    def add_planned(self, calls: int) -> None:
+        self.planned_calls += calls
+
+    @contextmanager
+    def track_request(self) -> Iterator[None]:
+        """Cuenta la petición como en vuelo mientras dura el bloque."""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def record_retry(self, *_: Any) -> None:
+        self.retries += 1
+
+    def record_fallback(self) -> None:
+        """Una fila empaquetada que hubo que reenviar en una llamada individual."""
+        self.fallbacks += 1
+
+    def record_tier(self, tier: str, latency: float, outcome: str) -> None:
+        """Resultado (aceptada, rechazada o error) de una llamada a un nivel de la cascada."""
+        self.tiers.setdefault(tier, TierMetrics()).record(latency, outcome)
+
+    def row_finished(self, rows: int, latency: float, *, failed: bool) -> None:
+        self.completed_calls += 1
+        self.completed_rows += rows
+        self._latencies.append(latency)
+        if failed:
+            self.errors += 1
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def merge(self, other: "RunMetrics") -> None:
+        """Suma los contadores de ``other`` (por ejemplo, los de un shard)."""
+        self.completed_calls += other.completed_calls
+        self.completed_rows += other.completed_rows
+        self.retries += other.retries
+        self.errors += other.errors
+        self.fallbacks += other.fallbacks
+        for tier, metrics in other.tiers.items():
+            self.tiers.setdefault(tier, TierMetrics()).merge(metrics)
+        self._latencies.extend(other._latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started
+        calls_per_second = self.completed_calls / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.planned_calls - self.completed_calls)
+        latencies = sorted(self._latencies)
+        snapshot = {
+            "transcurrido_s": round(elapsed, 3),
+            "llamadas_planificadas": self.planned_calls,
+            "llamadas_completadas": self.completed_calls,
+            "filas_completadas": self.completed_rows,
+            "filas_por_segundo": round(self.completed_rows / elapsed, 3) if elapsed > 0 else 0.0,
+            "en_vuelo": self.in_flight,
+            "latencia_p50_s": _round(percentile(latencies, 0.50)),
+            "latencia_p95_s": _round(percentile(latencies, 0.95)),
+            "latencia_p99_s": _round(percentile(latencies, 0.99)),
+            "reintentos": self.retries,
+            "errores": self.errors,
+            "reenvios_individuales": self.fallbacks,
+            "eta_s": round(remaining / calls_per_second, 1) if calls_per_second > 0 else None,
+        }
+        if self.tiers:
+            snapshot["niveles"] = {
+                tier: metrics.snapshot() for tier, metrics in sorted(self.tiers.items())
+            }
+        return snapshot
+
+    def emit(self) -> Dict[str, Any]:
+        snapshot = self.snapshot()
+        self._last_emit = time.monotonic()
+        if self.callback is not None:
+            self.callback(snapshot)
+        if self.path is not None:
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        return snapshot
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
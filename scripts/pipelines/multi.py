@@ -0,0 +1,236 @@
+"""Ejecución de varios prompts sobre el mismo dataset en una sola pasada."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set
+
+import pandas as pd
+from langchain_core.prompts import BasePromptTemplate
+
+from scripts.configs.config import Settings
+from scripts.configs.llm_factory import build_chat_model
+from scripts.pipelines.base import (
+    ResponseParser,
+    RowMapper,
+    TabularPromptRunner,
+    submit_bounded,
+)
+from scripts.pipelines.checkpoint import ProgressJournal
+from scripts.pipelines.metrics import ProgressCallback, RunMetrics
+from scripts.pipelines.planning import RunPlan
+from scripts.pipelines.retry import CLIENT_MAX_RETRIES, RetryPolicy
+from scripts.utils.io_utils import load_dataframe, save_dataframe, write_back_columns
+
+
+@dataclass(frozen=True)
+class PromptSpec:
+    """Un prompt y la columna donde se guardan sus respuestas."""
+
+    prompt: BasePromptTemplate
+    output_column: str
+    prompt_variable: str = "question"
+    build_variables: Optional[RowMapper] = None
+    response_parser: Optional[ResponseParser] = None
+    output_dtype: Optional[Any] = None
+
+
+@dataclass
+class MultiPromptRunner:
+    """Ejecuta varios ``PromptSpec`` sobre un único DataFrame cargado una vez.
+
+    Todas las columnas comparten el mismo cliente del modelo y el mismo
+    presupuesto de ``concurrency``; el archivo se guarda una sola vez al
+    final. Cada spec se procesa con un ``TabularPromptRunner`` interno, por
+    lo que el journal, la deduplicación y el guardado incremental se
+    comportan igual que en ese runner. Las métricas (``metrics``) se
+    acumulan en un único ``RunMetrics`` para todas las columnas.
+    """
+
+    settings: Settings
+    specs: Sequence[PromptSpec]
+    input_column: str
+    skip_rows: int = 0
+    overwrite: bool = False
+    concurrency: int = 1
+    row_timeout: Optional[float] = None
+    checkpoint: bool = False
+    checkpoint_every: int = 50
+    checkpoint_interval: Optional[float] = 30.0
+    coalesce_duplicates: bool = False
+    incremental_save: bool = False
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    only_failed: bool = False
+    on_progress: Optional[ProgressCallback] = None
+    metrics_path: Optional[Path] = None
+    metrics_interval: float = 5.0
+    pack_size: int = 1
+    compact_input: bool = False
+    last_plans: Dict[str, RunPlan] = field(default_factory=dict, init=False, repr=False)
+    metrics: RunMetrics = field(default_factory=RunMetrics, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        output_columns = [spec.output_column for spec in self.specs]
+        if len(set(output_columns)) != len(output_columns):
+            raise ValueError("Cada PromptSpec debe escribir en una columna distinta.")
+
+    def run(self) -> pd.DataFrame:
+        if self.concurrency > 1:
+            return asyncio.run(self.arun())
+
+        runners, df, journals, restored = self._prepare()
+        llm = build_chat_model(
+            self.settings, max_retries=CLIENT_MAX_RETRIES, timeout=self.row_timeout
+        )
+
+        try:
+            for runner, journal, entries in zip(runners, journals, restored):
+                chain = runner.build_chain(llm)
+                plan = self._plan(runner, df, entries)
+                runner.run_frame(df, plan, chain, journal)
+        finally:
+            self._flush(journals)
+            self.metrics.emit()
+
+        return self._finish(runners, df, journals, restored)
+
+    async def arun(self) -> pd.DataFrame:
+        """Versión asíncrona: las filas de todos los prompts comparten un semáforo."""
+        runners, df, journals, restored = self._prepare()
+        llm = build_chat_model(
+            self.settings, max_retries=CLIENT_MAX_RETRIES, timeout=self.row_timeout
+        )
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        # Como en ``TabularPromptRunner.arun``: sólo se crean tareas a medida
+        # que las anteriores terminan, no una por fila pendiente de golpe.
+        max_in_flight = max(1, self.concurrency) * 2
+
+        in_flight: Set[asyncio.Task] = set()
+        try:
+            for runner, journal, entries in zip(runners, journals, restored):
+                chain = runner.build_chain(llm)
+                plan = self._plan(runner, df, entries)
+                await submit_bounded(
+                    runner.frame_calls(df, plan, chain, semaphore, journal),
+                    in_flight,
+                    max_in_flight,
+                )
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            self._flush(journals)
+            self.metrics.emit()
+
+        return self._finish(runners, df, journals, restored)
+
+    def plan(self) -> Dict[str, RunPlan]:
+        """Dry-run por columna de salida, sin construir el modelo."""
+        runners, df, _, restored = self._prepare(
+            track_metrics=False, cache=self.settings.data_cache
+        )
+        return {
+            runner.output_column: runner.plan_frame(df, entries)
+            for runner, entries in zip(runners, restored)
+        }
+
+    def _runner_for(self, spec: PromptSpec) -> TabularPromptRunner:
+        return TabularPromptRunner(
+            settings=self.settings,
+            prompt=spec.prompt,
+            input_column=self.input_column,
+            output_column=spec.output_column,
+            prompt_variable=spec.prompt_variable,
+            skip_rows=self.skip_rows,
+            overwrite=self.overwrite,
+            build_variables=spec.build_variables,
+            response_parser=spec.response_parser,
+            output_dtype=spec.output_dtype,
+            compact_input=self.compact_input,
+            row_timeout=self.row_timeout,
+            checkpoint=self.checkpoint,
+            checkpoint_every=self.checkpoint_every,
+            checkpoint_interval=self.checkpoint_interval,
+            coalesce_duplicates=self.coalesce_duplicates,
+            incremental_save=self.incremental_save,
+            retry_policy=self.retry_policy,
+            only_failed=self.only_failed,
+            pack_size=self.pack_size,
+        )
+
+    def _prepare(self, *, track_metrics: bool = True, cache: bool = False):
+        self.last_plans = {}
+        runners = [self._runner_for(spec) for spec in self.specs]
+        if track_metrics:
+            self.metrics = RunMetrics(
+                callback=self.on_progress,
+                path=self.metrics_path,
+                interval=self.metrics_interval,
+            )
+            for runner in runners:
+                runner.metrics = self.metrics
+        df = load_dataframe(
+            self.settings.data_file,
+            header=self.settings.data_header,
+            columns=self._load_columns(runners),
+            cache=cache,
+        )
+        for runner in runners:
+            df = runner.prepare_frame(df)
+        checkpoints = [runner.open_checkpoint() for runner in runners]
+        journals = [journal for journal, _ in checkpoints]
+        restored = [entries for _, entries in checkpoints]
+        return runners, df, journals, restored
+
+    @staticmethod
+    def _load_columns(runners: Sequence[TabularPromptRunner]) -> Optional[List[Any]]:
+        columns: List[Any] = []
+        for runner in runners:
+            runner_columns = runner.load_columns()
+            if runner_columns is None:
+                return None
+            columns.extend(column for column in runner_columns if column not in columns)
+        return columns
+
+    def _plan(
+        self,
+        runner: TabularPromptRunner,
+        df: pd.DataFrame,
+        restored: Mapping[Any, Any],
+    ) -> RunPlan:
+        plan = runner.plan_frame(df, restored)
+        self.last_plans[runner.output_column] = plan
+        return plan
+
+    @staticmethod
+    def _flush(journals: Sequence[Optional[ProgressJournal]]) -> None:
+        for journal in journals:
+            if journal is not None:
+                journal.flush()
+
+    def _finish(
+        self,
+        runners: Sequence[TabularPromptRunner],
+        df: pd.DataFrame,
+        journals: Sequence[Optional[ProgressJournal]],
+        restored: Sequence[Mapping[Any, Any]],
+    ) -> pd.DataFrame:
+        if self.incremental_save:
+            updates = {}
+            for runner, entries in zip(runners, restored):
+                updates.update(runner.updated_cells(df, entries))
+            write_back_columns(
+                df,
+                self.settings.data_file,
+                updates,
+                header=self.settings.data_header,
+            )
+        else:
+            save_dataframe(df, self.settings.data_file)
+
+        for runner, journal in zip(runners, journals):
+            runner.close_checkpoint(journal)
+        return df
@@ -0,0 +1,89 @@
+"""Empaquetado de varias filas en una sola petición al modelo."""
+
+from __future__ import annotations
+
+import json
+import re
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence, TypeVar
+
+from langchain_core.prompts import BasePromptTemplate, PromptTemplate
+
+PACK_PROMPT = PromptTemplate.from_template(
+    "Vas a recibir varios elementos en formato JSON. Para cada elemento, sigue "
+    "estas instrucciones reemplazando cada <marcador> por el campo del mismo "
+    "nombre del elemento:\n\n"
+    "'''{instructions}'''\n\n"
+    "Elementos:\n{items}\n\n"
+    "Responde únicamente con un arreglo JSON con un objeto "
+    '{{"id": "<id del elemento>", "respuesta": "<tu respuesta>"}} por elemento, '
+    "en el mismo orden y sin texto adicional."
+)
+
+T = TypeVar("T")
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def render_instructions(prompt: BasePromptTemplate) -> str:
+    """Renderiza ``prompt`` con ``<variable>`` en lugar de cada valor."""
+    return prompt.format(**{name: f"<{name}>" for name in prompt.input_variables})
+
+
+def build_pack_input(
+    prompt: BasePromptTemplate,
+    items: Sequence[Mapping[str, Any]],
+) -> Dict[str, str]:
+    """Variables de ``PACK_PROMPT`` para un paquete; los ids son ``"1"``, ``"2"``, ..."""
+    payload = [
+        {"id": str(position), **dict(variables)}
+        for position, variables in enumerate(items, start=1)
+    ]
+    return {
+        "instructions": render_instructions(prompt),
+        "items": json.dumps(payload, ensure_ascii=False, default=str),
+    }
+
+
+def parse_packed_response(text: Any) -> Dict[str, str]:
+    """Devuelve ``{id: respuesta}`` a partir de la respuesta del modelo.
+
+    Tolera bloques de código y texto alrededor del JSON. Los elementos sin
+    respuesta válida se omiten; si nada se puede interpretar devuelve ``{}``.
+    """
+    if not isinstance(text, str):
+        return {}
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        entries = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    answers: Dict[str, str] = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or "id" not in entry:
+            continue
+        answer = entry.get("respuesta")
+        if isinstance(answer, (dict, list)):
+            answer = json.dumps(answer, ensure_ascii=False)
+        if answer is None or not str(answer).strip():
+            continue
+        answers[str(entry["id"])] = str(answer)
+    return answers
+
+
+def iter_packs(items: Iterable[T], pack_size: int) -> Iterator[List[T]]:
+    """Agrupa ``items`` en listas de hasta ``pack_size`` elementos."""
+    iterator = iter(items)
+    while True:
+        pack = list(islice(iterator, pack_size))
+        if not pack:
+            return
+        yield pack
@@ -0,0 +1,170 @@
+"""Planificación vectorizada de las filas que debe procesar un runner tabular."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+# Versiones anteriores guardaban el fallo en la columna de salida.
+LEGACY_ERROR_PREFIX = "Error: "
+
+
+@dataclass(frozen=True)
+class RunPlan:
+    """Resultado de clasificar las filas antes de enviar cualquier petición."""
+
+    to_send: pd.Index
+    total: int = 0
+    skipped_offset: int = 0
+    skipped_missing_input: int = 0
+    already_done: int = 0
+    # Grupos de filas con la misma entrada normalizada; ``None`` si no se agrupa.
+    groups: Optional[List[List[Any]]] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self.to_send)
+
+    @property
+    def calls(self) -> int:
+        return self.pending if self.groups is None else len(self.groups)
+
+    @property
+    def calls_saved(self) -> int:
+        return self.pending - self.calls
+
+    def iter_groups(self) -> Iterator[List[Any]]:
+        if self.groups is None:
+            for index in self.to_send:
+                yield [index]
+        else:
+            yield from self.groups
+
+    def __add__(self, other: "RunPlan") -> "RunPlan":
+        return combine_plans([self, other])
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "total": self.total,
+            "enviar": self.pending,
+            "omitidas_offset": self.skipped_offset,
+            "omitidas_sin_entrada": self.skipped_missing_input,
+            "sin_cambios": self.already_done,
+            "llamadas": self.calls,
+            "llamadas_ahorradas": self.calls_saved,
+        }
+
+
+def empty_plan() -> RunPlan:
+    return RunPlan(to_send=pd.Index([]))
+
+
+def combine_plans(plans: Sequence[RunPlan]) -> RunPlan:
+    """Une los planes de varios bloques concatenando índices y grupos una sola vez.
+
+    Para una ejecución por bloques conviene acumular los planes en una lista
+    y combinarlos al final: sumarlos de a uno copia todo lo anterior cada vez.
+    """
+    if not plans:
+        return empty_plan()
+    if len(plans) == 1:
+        return plans[0]
+    groups = None
+    if any(plan.groups is not None for plan in plans):
+        groups = [group for plan in plans for group in plan.iter_groups()]
+    return RunPlan(
+        to_send=plans[0].to_send.append([plan.to_send for plan in plans[1:]]),
+        total=sum(plan.total for plan in plans),
+        skipped_offset=sum(plan.skipped_offset for plan in plans),
+        skipped_missing_input=sum(plan.skipped_missing_input for plan in plans),
+        already_done=sum(plan.already_done for plan in plans),
+        groups=groups,
+    )
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    """Normaliza textos para compararlos: sin espacios sobrantes ni mayúsculas."""
+    return (
+        values.astype(str)
+        .str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.casefold()
+    )
+
+
+def group_duplicates(values: pd.Series) -> List[List[Any]]:
+    """Agrupa los índices de ``values`` por texto normalizado, en orden de aparición."""
+    groups: Dict[str, List[Any]] = {}
+    for index, key in zip(values.index, normalize_text(values)):
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+
+def legacy_errors(values: pd.Series) -> pd.Series:
+    """Marca las salidas ``"Error: ..."`` que dejaron versiones anteriores en lugar de la respuesta."""
+    if values.dtype != object and not isinstance(values.dtype, pd.StringDtype):
+        return pd.Series(False, index=values.index)
+    return values.str.startswith(LEGACY_ERROR_PREFIX, na=False).astype(bool)
+
+
+def plan_rows(
+    df: pd.DataFrame,
+    *,
+    input_column: str,
+    output_column: str,
+    skip_rows: int = 0,
+    overwrite: bool = False,
+    completed: Collection[Any] = (),
+    coalesce_duplicates: bool = False,
+    failed_column: Optional[str] = None,
+) -> RunPlan:
+    """Calcula con máscaras de pandas qué filas hay que enviar al modelo.
+
+    Las categorías son excluyentes y se evalúan en este orden: filas antes de
+    ``skip_rows``, filas ya resueltas (en ``completed`` o con salida previa
+    cuando ``overwrite`` es falso) y filas sin valor de entrada.
+
+    Con ``coalesce_duplicates`` las filas a enviar se agrupan por entrada
+    normalizada para hacer una sola llamada por grupo. Con ``failed_column``
+    sólo se envían las filas que tienen un error registrado en esa columna;
+    el resto cuenta como sin cambios. Una salida ``"Error: ..."`` (formato
+    anterior) cuenta como fallo y no como fila resuelta.
+    """
+    in_range = pd.Series(df.index >= skip_rows, index=df.index)
+
+    done = pd.Series(df.index.isin(list(completed)), index=df.index)
+    legacy = pd.Series(False, index=df.index)
+    if output_column in df.columns:
+        legacy = legacy_errors(df[output_column]) & ~done
+        if not overwrite:
+            done |= df[output_column].notna() & ~legacy
+    if failed_column is not None:
+        failed = legacy.copy()
+        if failed_column in df.columns:
+            failed |= df[failed_column].notna()
+        done |= ~failed
+
+    if input_column in df.columns:
+        has_input = df[input_column].notna()
+    else:
+        has_input = pd.Series(False, index=df.index)
+
+    done &= in_range
+    missing_input = in_range & ~done & ~has_input
+    to_send = in_range & ~done & has_input
+
+    to_send_index = df.index[to_send.to_numpy()]
+    groups = None
+    if coalesce_duplicates:
+        groups = group_duplicates(df.loc[to_send_index, input_column])
+
+    return RunPlan(
+        to_send=to_send_index,
+        total=len(df),
+        skipped_offset=int((~in_range).sum()),
+        skipped_missing_input=int(missing_input.sum()),
+        already_done=int(done.sum()),
+        groups=groups,
+    )
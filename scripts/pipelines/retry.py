@@ -0,0 +1,94 @@
+"""Reintentos con backoff exponencial para llamadas al modelo."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+T = TypeVar("T")
+
+# 408 (timeout), 409 (conflicto transitorio) y 429 (cuota) se reintentan, igual
+# que cualquier 5xx. El resto de códigos 4xx indica un error de la petición.
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429})
+
+RetryCallback = Callable[[int, BaseException, float], None]
+
+# Los runners crean el cliente de OpenAI sin reintentos propios: si no, cada
+# intento de ``RetryPolicy`` ocultaría hasta 2 reintentos más del SDK y
+# ``max_attempts`` y las métricas no reflejarían las peticiones enviadas.
+CLIENT_MAX_RETRIES = 0
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Distingue errores transitorios (red, timeouts, 429, 5xx) de los definitivos."""
+    if isinstance(exc, (TimeoutError, ConnectionError, openai.APIConnectionError)):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Política de reintentos: ``max_attempts`` incluye el primer intento.
+
+    La espera antes del intento ``n + 1`` es ``base_delay * 2 ** (n - 1)``,
+    acotada por ``max_delay`` y multiplicada por un factor aleatorio en
+    ``[1 - jitter, 1 + jitter]`` para no sincronizar a los clientes.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    jitter: float = 0.5
+    retryable: Callable[[BaseException], bool] = is_retryable_error
+
+    def delay(self, attempt: int) -> float:
+        base = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def should_retry(self, attempt: int, exc: BaseException) -> bool:
+        return attempt < self.max_attempts and self.retryable(exc)
+
+    def call(self, fn: Callable[[], T], on_retry: Optional[RetryCallback] = None) -> T:
+        """Ejecuta ``fn`` reintentando; relanza la última excepción si no hay éxito."""
+        attempt = 1
+        while True:
+            try:
+                return fn()
+            except Exception as exc:
+                if not self.should_retry(attempt, exc):
+                    raise
+                wait = self.delay(attempt)
+                if on_retry is not None:
+                    on_retry(attempt, exc, wait)
+                time.sleep(wait)
+                attempt += 1
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        on_retry: Optional[RetryCallback] = None,
+    ) -> T:
+        """Versión asíncrona de ``call``; ``fn`` crea una corrutina nueva por intento."""
+        attempt = 1
+        while True:
+            try:
+                return await fn()
+            except Exception as exc:
+                if not self.should_retry(attempt, exc):
+                    raise
+                wait = self.delay(attempt)
+                if on_retry is not None:
+                    on_retry(attempt, exc, wait)
+                await asyncio.sleep(wait)
+                attempt += 1
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,159 @@
+"""Ejecución de un ``TabularPromptRunner`` repartida en varios procesos."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from scripts.pipelines.checkpoint import ProgressJournal
+from scripts.pipelines.metrics import RunMetrics
+from scripts.pipelines.planning import RunPlan
+from scripts.utils.io_utils import load_dataframe, save_dataframe, write_back_columns
+
+if TYPE_CHECKING:  # pragma: no cover - sólo para anotaciones
+    from scripts.pipelines.base import TabularPromptRunner
+
+Group = List[Any]
+
+
+def split_groups(plan: RunPlan, shards: int) -> List[List[Group]]:
+    """Reparte los grupos del plan entre ``shards`` de forma intercalada.
+
+    El reparto sólo depende del orden del plan, así que es el mismo en cada
+    ejecución para los mismos datos.
+    """
+    groups = list(plan.iter_groups())
+    return [groups[shard::shards] for shard in range(shards)]
+
+
+def run_sharded(runner: "TabularPromptRunner") -> pd.DataFrame:
+    """Ejecuta ``runner`` en ``runner.shards`` procesos y guarda el resultado."""
+    # El callback puede no ser serializable; los workers sólo escriben su JSONL.
+    worker = dataclasses.replace(runner, on_progress=None)
+    _check_picklable(worker)
+
+    journal, restored = runner.open_checkpoint()
+    df = runner.prepare_frame(
+        load_dataframe(
+            runner.settings.data_file,
+            header=runner.settings.data_header,
+            columns=runner.load_columns(),
+        )
+    )
+    runner.metrics = runner.new_metrics()
+    plan = runner.plan_frame(df, restored)
+    columns = _shard_columns(runner, df)
+    shard_rows = [
+        [index for group in groups for index in group]
+        for groups in split_groups(plan, runner.shards)
+        if groups
+    ]
+
+    if shard_rows:
+        # "spawn" evita heredar hilos y bucles de eventos del proceso padre.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shard_rows), mp_context=context) as pool:
+            futures = [
+                pool.submit(_run_shard, worker, shard, df.loc[rows, columns])
+                for shard, rows in enumerate(shard_rows)
+            ]
+            # Se combinan en orden de shard, no de llegada: resultado determinista.
+            results = [future.result() for future in futures]
+
+        for result, metrics in results:
+            df.loc[result.index, result.columns] = result
+            runner.metrics.merge(metrics)
+
+    runner.metrics.emit()
+    if runner.incremental_save:
+        write_back_columns(
+            df,
+            runner.settings.data_file,
+            runner.updated_cells(df, restored),
+            header=runner.settings.data_header,
+        )
+    else:
+        save_dataframe(df, runner.settings.data_file)
+    runner.close_checkpoint(journal)
+    return df
+
+
+def _check_picklable(worker: "TabularPromptRunner") -> None:
+    """Falla antes de crear el pool si el runner no se puede enviar a los workers."""
+    for name in ("build_variables", "response_parser", "cascade"):
+        _dumps(getattr(worker, name), name)
+    _dumps(worker, "el runner")
+
+
+def _dumps(value: Any, name: str) -> None:
+    try:
+        pickle.dumps(value)
+    except (pickle.PicklingError, AttributeError, TypeError) as exc:
+        raise ValueError(
+            f"Con shards mayor a 1, {name} debe poder serializarse con pickle "
+            "para enviarse a los procesos (usa funciones definidas a nivel de "
+            f"módulo, no lambdas ni funciones anidadas): {exc}"
+        ) from exc
+
+
+def _shard_columns(runner: "TabularPromptRunner", df: pd.DataFrame) -> List[Any]:
+    if runner.build_variables is not None:
+        # build_variables puede leer cualquier columna de la fila.
+        return list(df.columns)
+    return [runner.input_column, runner.output_column, runner.error_column]
+
+
+def _run_shard(
+    runner: "TabularPromptRunner",
+    shard: int,
+    frame: pd.DataFrame,
+) -> Tuple[pd.DataFrame, RunMetrics]:
+    journal, _ = runner.open_checkpoint(shard=shard)
+    chain = runner.build_chain()
+    runner.metrics = runner.new_metrics(shard=shard)
+    # ``frame`` sólo contiene grupos completos del plan del proceso principal,
+    # así que planificarlo de nuevo envía exactamente esas filas.
+    plan = runner.plan_frame(frame, {})
+    try:
+        if runner.concurrency > 1:
+            asyncio.run(_arun_shard(runner, frame, plan, chain, journal))
+        else:
+            runner.run_frame(frame, plan, chain, journal)
+    finally:
+        if journal is not None:
+            journal.flush()
+        runner.metrics.emit()
+    return frame[[runner.output_column, runner.error_column]], runner.metrics
+
+
+async def _arun_shard(
+    runner: "TabularPromptRunner",
+    frame: pd.DataFrame,
+    plan: RunPlan,
+    chain,
+    journal: Optional[ProgressJournal],
+) -> None:
+    # Import diferido: ``base`` importa este módulo.
+    from scripts.pipelines.base import submit_bounded
+
+    semaphore = asyncio.Semaphore(max(1, runner.concurrency))
+    # Como en ``TabularPromptRunner.arun``: las tareas se crean a medida que
+    # terminan las anteriores, no una por fila del shard de golpe.
+    in_flight: Set[asyncio.Task] = set()
+    try:
+        await submit_bounded(
+            runner.frame_calls(frame, plan, chain, semaphore, journal),
+            in_flight,
+            max(1, runner.concurrency) * 2,
+        )
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        for task in in_flight:
+            task.cancel()
@@ -1,19 +1,793 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
 from pathlib import Path
-from typing import Iterable, Mapping, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
 import pandas as pd
 
+DEFAULT_CHUNK_SIZE = 1_000
 
-def load_dataframe(path: Path, *, header: Optional[int]) -> pd.DataFrame:
-    """Carga un DataFrame desde un archivo Excel."""
-    return pd.read_excel(path, header=header)
+# Una hoja de Excel admite 1.048.576 filas, incluida la de encabezados.
+EXCEL_MAX_ROWS = 1_048_576
+MANIFEST_SUFFIX = ".manifest.json"
+PARTITION_LAYOUTS = ("files", "sheets")
+
+# Formatos de texto cuyo parseo compensa guardar en un cache binario.
+CACHEABLE_FORMATS = frozenset({"excel", "csv", "jsonl"})
+CACHE_SUFFIX = ".cache.pkl"
+
+# Extensión -> formato. ``header`` sólo aplica a Excel y CSV; el resto guarda
+# los nombres de columna dentro del propio archivo.
+FILE_FORMATS = {
+    ".xlsx": "excel",
+    ".xlsm": "excel",
+    ".xls": "excel",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".jsonl": "jsonl",
+}
+
+
+def file_format(path: Path) -> str:
+    """Devuelve el formato asociado a la extensión de ``path``."""
+    if is_manifest(path):
+        return "manifest"
+    try:
+        return FILE_FORMATS[path.suffix.lower()]
+    except KeyError:
+        supported = ", ".join(sorted(FILE_FORMATS))
+        raise ValueError(
+            f"Formato de archivo no soportado: '{path.suffix}'. Usa uno de: {supported}."
+        ) from None
+
+
+def is_manifest(path: Path) -> bool:
+    return path.name.lower().endswith(MANIFEST_SUFFIX)
+
+
+def manifest_path_for(path: Path) -> Path:
+    """Ruta del manifiesto de un dataset particionado: ``datos.xlsx`` -> ``datos.manifest.json``."""
+    return path.with_name(f"{path.stem}{MANIFEST_SUFFIX}")
+
+
+def _require_pyarrow(fmt: str) -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:  # pragma: no cover - depende del entorno
+        raise RuntimeError(
+            f"El formato {fmt} requiere pyarrow. Instálalo con `uv sync --extra arrow`."
+        ) from exc
+
+
+def load_dataframe(
+    path: Path,
+    *,
+    header: Optional[int],
+    columns: Optional[Sequence[Any]] = None,
+    cache: bool = False,
+) -> pd.DataFrame:
+    """Carga un DataFrame eligiendo el lector según la extensión del archivo.
+
+    Un manifiesto (``*.manifest.json``) se carga como un único DataFrame con
+    todas sus particiones; ``header`` no se aplica porque cada partición
+    guarda sus encabezados.
+
+    ``columns`` limita la lectura a esas columnas (las que no existan se
+    ignoran). Con ``cache`` los formatos de texto se guardan ya parseados en
+    un archivo oculto junto al original (ver ``sidecar_cache_path``), que se
+    reutiliza mientras no cambien la fecha de modificación ni el tamaño.
+    """
+    fmt = file_format(path)
+    if not cache or fmt not in CACHEABLE_FORMATS:
+        return _read_dataframe(path, fmt, header=header, columns=columns)
+
+    cache_path = sidecar_cache_path(path, header=header, columns=columns)
+    signature = _cache_signature(path, header=header, columns=columns)
+    cached = _open_sidecar(cache_path, signature)
+    if cached is not None:
+        frames = list(_iter_sidecar(cached))
+        return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+    df = _read_dataframe(path, fmt, header=header, columns=columns)
+    for _ in _cached_chunks(iter([df]), cache_path, signature):
+        pass
+    return df
+
+
+def _read_dataframe(
+    path: Path,
+    fmt: str,
+    *,
+    header: Optional[int],
+    columns: Optional[Sequence[Any]],
+) -> pd.DataFrame:
+    wanted = None if columns is None else set(columns)
+    usecols = None if wanted is None else (lambda name: name in wanted)
+    if fmt == "manifest":
+        return _project(load_partitioned(path), columns)
+    if fmt == "excel":
+        return pd.read_excel(path, header=header, usecols=usecols)
+    if fmt == "csv":
+        return pd.read_csv(path, header=header, usecols=usecols)
+    if fmt == "jsonl":
+        return _project(pd.read_json(path, lines=True), columns)
+    _require_pyarrow(fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        names = None if wanted is None else [
+            name for name in pq.read_schema(path).names if name in wanted
+        ]
+        return pd.read_parquet(path, columns=names)
+
+    import pyarrow.ipc
+
+    names = None
+    if wanted is not None:
+        with pyarrow.ipc.open_file(path) as reader:
+            names = [name for name in reader.schema.names if name in wanted]
+    return pd.read_feather(path, columns=names)
+
+
+def _project(df: pd.DataFrame, columns: Optional[Sequence[Any]]) -> pd.DataFrame:
+    if columns is None:
+        return df
+    wanted = set(columns)
+    return df[[column for column in df.columns if column in wanted]]
+
+
+def sidecar_cache_path(
+    path: Path,
+    *,
+    header: Optional[int],
+    columns: Optional[Sequence[Any]] = None,
+) -> Path:
+    """Ruta del cache parseado de ``path``: ``.<nombre>.<clave>.cache.pkl``.
+
+    La clave distingue ``header`` y ``columns``, porque cambian el resultado
+    del parseo.
+    """
+    key = json.dumps(
+        {"header": header, "columns": None if columns is None else sorted(map(str, columns))}
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return path.with_name(f".{path.name}.{digest}{CACHE_SUFFIX}")
+
+
+def _cache_signature(
+    path: Path,
+    *,
+    header: Optional[int],
+    columns: Optional[Sequence[Any]],
+) -> Dict[str, Any]:
+    stat = path.stat()
+    return {
+        "source": str(path.resolve()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "header": header,
+        "columns": None if columns is None else sorted(map(str, columns)),
+    }
+
+
+def _open_sidecar(cache_path: Path, signature: Mapping[str, Any]):
+    """Abre el cache si corresponde a ``signature``; si no, devuelve ``None``."""
+    try:
+        handle = cache_path.open("rb")
+    except FileNotFoundError:
+        return None
+    try:
+        stored = pickle.load(handle)
+    except Exception:
+        handle.close()
+        return None
+    if stored != signature:
+        handle.close()
+        return None
+    return handle
+
+
+def _iter_sidecar(handle) -> Iterator[pd.DataFrame]:
+    # El cache es una secuencia de DataFrames serializados uno tras otro.
+    with handle:
+        while True:
+            try:
+                yield pickle.load(handle)
+            except EOFError:
+                return
+
+
+def _cached_chunks(
+    chunks: Iterator[pd.DataFrame],
+    cache_path: Path,
+    signature: Mapping[str, Any],
+) -> Iterator[pd.DataFrame]:
+    """Emite ``chunks`` guardando una copia; el cache sólo se publica si se leen todos."""
+    descriptor, temp_name = tempfile.mkstemp(
+        dir=cache_path.parent, prefix=cache_path.name, suffix=".tmp"
+    )
+    temp_path = Path(temp_name)
+    completed = False
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            pickle.dump(dict(signature), handle, protocol=pickle.HIGHEST_PROTOCOL)
+            for chunk in chunks:
+                # Se serializa antes de entregarlo: el llamador puede modificarlo.
+                pickle.dump(chunk, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                yield chunk
+        os.replace(temp_path, cache_path)
+        completed = True
+    finally:
+        if not completed:
+            temp_path.unlink(missing_ok=True)
+
+
+def iter_dataframe_chunks(
+    path: Path,
+    *,
+    header: Optional[int],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """Lee el archivo por bloques de ``chunk_size`` filas sin cargarlo completo.
+
+    Los bloques conservan el índice global (0, 1, 2, ...) que tendría
+    ``load_dataframe``, de modo que ``skip_rows`` y los journals siguen
+    apuntando a las mismas filas.
+
+    Con ``cache`` se usa el mismo cache que ``load_dataframe``: la primera
+    lectura completa lo genera bloque a bloque y las siguientes lo recorren
+    en bloques de ``chunk_size`` aunque se haya guardado con otro tamaño.
+    """
+    fmt = file_format(path)
+    if not cache or fmt not in CACHEABLE_FORMATS:
+        yield from _iter_source_chunks(path, fmt, header=header, chunk_size=chunk_size)
+        return
+
+    cache_path = sidecar_cache_path(path, header=header)
+    signature = _cache_signature(path, header=header, columns=None)
+    cached = _open_sidecar(cache_path, signature)
+    if cached is not None:
+        yield from _rechunk(_iter_sidecar(cached), chunk_size)
+        return
+    yield from _cached_chunks(
+        _iter_source_chunks(path, fmt, header=header, chunk_size=chunk_size),
+        cache_path,
+        signature,
+    )
+
+
+def _rechunk(chunks: Iterable[pd.DataFrame], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Reagrupa ``chunks`` en bloques de ``chunk_size`` filas (el último puede ser menor)."""
+    pending: List[pd.DataFrame] = []
+    buffered = 0
+    for chunk in chunks:
+        while len(chunk):
+            take = chunk_size - buffered
+            if take >= len(chunk):
+                piece, chunk = chunk, chunk.iloc[:0]
+            else:
+                # Copia: el llamador puede modificar el bloque que recibe.
+                piece, chunk = chunk.iloc[:take].copy(), chunk.iloc[take:]
+            pending.append(piece)
+            buffered += len(piece)
+            if buffered == chunk_size:
+                yield pending[0] if len(pending) == 1 else pd.concat(pending)
+                pending, buffered = [], 0
+    if pending:
+        yield pending[0] if len(pending) == 1 else pd.concat(pending)
+
+
+def _iter_source_chunks(
+    path: Path,
+    fmt: str,
+    *,
+    header: Optional[int],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    if fmt == "manifest":
+        yield from _iter_partition_chunks(path, chunk_size=chunk_size)
+    elif fmt == "excel":
+        yield from _iter_excel_chunks(path, header=header, chunk_size=chunk_size)
+    elif fmt == "csv":
+        yield from _iter_csv_chunks(path, header=header, chunk_size=chunk_size)
+    elif fmt == "jsonl":
+        with pd.read_json(path, lines=True, chunksize=chunk_size) as reader:
+            yield from reader
+    elif fmt == "parquet":
+        yield from _iter_parquet_chunks(path, chunk_size=chunk_size)
+    else:
+        # Feather no admite lectura parcial por filas: se carga y se trocea.
+        df = load_dataframe(path, header=header)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+
+
+def _iter_csv_chunks(
+    path: Path,
+    *,
+    header: Optional[int],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(path, header=header, chunksize=chunk_size) as reader:
+        yield from reader
+
+
+def _iter_parquet_chunks(path: Path, *, chunk_size: int) -> Iterator[pd.DataFrame]:
+    _require_pyarrow("parquet")
+    import pyarrow.parquet as pq
+
+    start = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def _iter_excel_chunks(
+    path: Path,
+    *,
+    header: Optional[int],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # pd.read_excel lee por defecto la primera hoja, no la activa.
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns: Optional[List[Any]] = None
+        if header is not None:
+            for _ in range(header):
+                next(rows, None)
+            header_row = next(rows, None)
+            if header_row is None:
+                return
+            columns = [
+                f"Unnamed: {position}" if name is None else name
+                for position, name in enumerate(header_row)
+            ]
+
+        buffer: List[Sequence[Any]] = []
+        blank_rows: List[Sequence[Any]] = []
+        start = 0
+        for values in rows:
+            # pandas descarta las filas vacías finales; sólo se emiten las
+            # intermedias cuando aparece una fila con datos después de ellas.
+            if all(value is None for value in values):
+                blank_rows.append(values)
+                continue
+            if blank_rows:
+                buffer.extend(blank_rows)
+                blank_rows.clear()
+            buffer.append(values)
+            if len(buffer) >= chunk_size:
+                yield _rows_to_frame(buffer, columns, start)
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield _rows_to_frame(buffer, columns, start)
+    finally:
+        workbook.close()
+
+
+def _rows_to_frame(
+    rows: List[Sequence[Any]],
+    columns: Optional[List[Any]],
+    start: int,
+) -> pd.DataFrame:
+    index = pd.RangeIndex(start, start + len(rows))
+    if columns is None:
+        return pd.DataFrame(list(rows), index=index)
+    width = len(columns)
+    padded = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    return pd.DataFrame(padded, columns=columns, index=index)
 
 
 def save_dataframe(df: pd.DataFrame, path: Path) -> None:
-    """Guarda un DataFrame en el archivo Excel indicado."""
-    df.to_excel(path, index=False)
+    """Guarda un DataFrame eligiendo el formato según la extensión del archivo.
+
+    Se escribe en un archivo temporal que luego reemplaza al original, así una
+    caída a mitad de escritura no deja el archivo corrupto.
+
+    Si ``path`` es un manifiesto, el DataFrame se vuelve a particionar con la
+    misma configuración (ver ``save_partitioned``).
+    """
+    fmt = file_format(path)
+    if fmt == "manifest":
+        manifest = read_manifest(path)
+        save_partitioned(
+            df,
+            path.with_name(manifest["base"]),
+            max_rows=manifest["max_rows"],
+            partition_column=manifest["partition_column"],
+            layout=manifest["layout"],
+        )
+    elif fmt == "excel":
+        if len(df) >= EXCEL_MAX_ROWS:
+            raise ValueError(
+                f"El DataFrame tiene {len(df)} filas y no cabe en una hoja de Excel; "
+                "usa save_partitioned para repartirlo en varias hojas o archivos."
+            )
+        _atomic_write(path, lambda target: df.to_excel(target, index=False))
+    elif fmt == "csv":
+        _atomic_write(path, lambda target: df.to_csv(target, index=False))
+    elif fmt == "jsonl":
+        _atomic_write(
+            path,
+            lambda target: df.to_json(
+                target, orient="records", lines=True, force_ascii=False
+            ),
+        )
+    else:
+        _require_pyarrow(fmt)
+        # Parquet y Feather exigen nombres de columna de tipo texto.
+        columnar = df.rename(columns=str).reset_index(drop=True)
+        if fmt == "parquet":
+            _atomic_write(path, lambda target: columnar.to_parquet(target, index=False))
+        else:
+            _atomic_write(path, columnar.to_feather)
+
+
+def save_partitioned(
+    df: pd.DataFrame,
+    path: Path,
+    *,
+    max_rows: Optional[int] = None,
+    partition_column: Optional[Any] = None,
+    layout: str = "files",
+) -> Path:
+    """Guarda ``df`` en varias particiones y escribe su manifiesto.
+
+    Las particiones se forman por valor de ``partition_column`` (si se
+    indica) y se cortan cada ``max_rows`` filas. Con ``layout="files"`` cada
+    partición es un archivo ``<nombre>.<partición><extensión>`` junto a
+    ``path``; con ``layout="sheets"`` (sólo Excel) todas van en ``path``,
+    una por hoja. En Excel ``max_rows`` nunca supera el límite de una hoja.
+
+    Devuelve la ruta del manifiesto, que ``load_dataframe`` y
+    ``iter_dataframe_chunks`` leen como un único dataset.
+    """
+    fmt = file_format(path)
+    if layout not in PARTITION_LAYOUTS:
+        raise ValueError(f"layout debe ser uno de {PARTITION_LAYOUTS}, se recibió '{layout}'.")
+    if layout == "sheets" and fmt != "excel":
+        raise ValueError("layout='sheets' sólo está disponible para archivos Excel.")
+    if max_rows is not None and max_rows < 1:
+        raise ValueError("max_rows debe ser mayor o igual a 1.")
+    if fmt == "excel":
+        limit = EXCEL_MAX_ROWS - 1
+        max_rows = limit if max_rows is None else min(max_rows, limit)
+
+    parts = list(_split_partitions(df, max_rows=max_rows, partition_column=partition_column))
+    entries: List[Dict[str, Any]] = []
+    if layout == "sheets":
+        sheet_names = _unique_sheet_names([label for label, _, _ in parts])
+        _atomic_write(path, lambda target: _write_excel_sheets(target, sheet_names, parts))
+        for sheet_name, (_, value, frame) in zip(sheet_names, parts):
+            entries.append({"file": path.name, "sheet": sheet_name, "value": value, "rows": len(frame)})
+    else:
+        for label, value, frame in parts:
+            part_path = path.with_name(f"{path.stem}.{label}{path.suffix}")
+            save_dataframe(frame, part_path)
+            entries.append({"file": part_path.name, "sheet": None, "value": value, "rows": len(frame)})
+
+    manifest_path = manifest_path_for(path)
+    previous_files = _partition_files(manifest_path)
+    _write_manifest(
+        manifest_path,
+        {
+            "base": path.name,
+            "format": fmt,
+            "layout": layout,
+            "max_rows": max_rows,
+            "partition_column": _json_value(partition_column),
+            "columns": [_json_value(column) for column in df.columns],
+            "total_rows": len(df),
+            "partitions": entries,
+        },
+    )
+    # Particiones de una escritura anterior que ya no forman parte del dataset.
+    for name in previous_files - {entry["file"] for entry in entries}:
+        (manifest_path.parent / name).unlink(missing_ok=True)
+    return manifest_path
+
+
+class PartitionAppender:
+    """Dataset particionado que se escribe por partes, sin tenerlo entero en memoria.
+
+    Cada ``append`` guarda una partición ``<nombre>.part-NNNN<extensión>``
+    junto a ``path`` y reescribe el manifiesto, que sólo lista particiones
+    completas: si el proceso se interrumpe, ``load_dataframe(manifest_path)``
+    lee todo lo escrito hasta la última llamada. Al crearlo se eliminan las
+    particiones de una escritura anterior en la misma ruta.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.manifest_path = manifest_path_for(path)
+        self.columns: Optional[List[Any]] = None
+        self.total_rows = 0
+        self.entries: List[Dict[str, Any]] = []
+        remove_partitioned(self.manifest_path)
+
+    def append(self, df: pd.DataFrame) -> None:
+        part_path = self.path.with_name(
+            f"{self.path.stem}.part-{len(self.entries):04d}{self.path.suffix}"
+        )
+        save_dataframe(df, part_path)
+        if self.columns is None:
+            self.columns = [_json_value(column) for column in df.columns]
+        self.total_rows += len(df)
+        self.entries.append({"file": part_path.name, "sheet": None, "value": None, "rows": len(df)})
+        _write_manifest(
+            self.manifest_path,
+            {
+                "base": self.path.name,
+                "format": file_format(self.path),
+                "layout": "files",
+                "max_rows": max(entry["rows"] for entry in self.entries),
+                "partition_column": None,
+                "columns": self.columns,
+                "total_rows": self.total_rows,
+                "partitions": self.entries,
+            },
+        )
+
+
+def merge_partitions(manifest_path: Path, target: Path) -> None:
+    """Une las particiones de ``manifest_path`` en ``target`` y las elimina.
+
+    En Excel las filas se escriben en modo ``write_only`` de openpyxl
+    partición a partición, así la memoria no crece con el tamaño del dataset.
+    """
+    manifest = read_manifest(manifest_path)
+    if file_format(target) != "excel":
+        save_dataframe(load_partitioned(manifest_path), target)
+    elif manifest["total_rows"] >= EXCEL_MAX_ROWS:
+        raise ValueError(
+            f"El dataset tiene {manifest['total_rows']} filas y no cabe en una hoja de Excel."
+        )
+    else:
+        _atomic_write(target, lambda path: _write_excel_rows(path, manifest_path))
+    remove_partitioned(manifest_path)
+
+
+def _write_excel_rows(target: Path, manifest_path: Path) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(read_manifest(manifest_path)["columns"])
+    for frame in iter_partitions(manifest_path):
+        for row in frame.itertuples(index=False, name=None):
+            sheet.append([None if _is_missing(value) else value for value in row])
+    workbook.save(target)
+
+
+def remove_partitioned(manifest_path: Path) -> None:
+    """Elimina el manifiesto y los archivos de partición que lista."""
+    for name in _partition_files(manifest_path, separate_only=True):
+        (manifest_path.parent / name).unlink(missing_ok=True)
+    manifest_path.unlink(missing_ok=True)
+
+
+def _partition_files(manifest_path: Path, *, separate_only: bool = False) -> set:
+    if not manifest_path.exists():
+        return set()
+    return {
+        entry["file"]
+        for entry in read_manifest(manifest_path)["partitions"]
+        if not (separate_only and entry["sheet"] is not None)
+    }
+
+
+def _write_manifest(manifest_path: Path, manifest: Mapping[str, Any]) -> None:
+    _atomic_write(
+        manifest_path,
+        lambda target: target.write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+        ),
+    )
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el manifiesto en: {path}")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def iter_partitions(manifest_path: Path) -> Iterator[pd.DataFrame]:
+    """Lee una a una las particiones listadas en el manifiesto, en orden."""
+    manifest = read_manifest(manifest_path)
+    columns = manifest["columns"]
+    for entry in manifest["partitions"]:
+        part_path = manifest_path.parent / entry["file"]
+        if entry["sheet"] is not None:
+            frame = pd.read_excel(part_path, sheet_name=entry["sheet"], header=0)
+        else:
+            frame = load_dataframe(part_path, header=0)
+        if len(frame.columns) == len(columns):
+            # Los encabezados vuelven como texto; se restauran los originales.
+            frame.columns = columns
+        yield frame
+
+
+def load_partitioned(manifest_path: Path) -> pd.DataFrame:
+    """Carga todas las particiones como un único DataFrame con índice 0..n-1."""
+    frames = list(iter_partitions(manifest_path))
+    if not frames:
+        return pd.DataFrame(columns=read_manifest(manifest_path)["columns"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _iter_partition_chunks(manifest_path: Path, *, chunk_size: int) -> Iterator[pd.DataFrame]:
+    start = 0
+    for frame in iter_partitions(manifest_path):
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        for offset in range(0, len(frame), chunk_size):
+            yield frame.iloc[offset : offset + chunk_size]
+
+
+def _split_partitions(
+    df: pd.DataFrame,
+    *,
+    max_rows: Optional[int],
+    partition_column: Optional[Any],
+) -> Iterator[Tuple[str, Any, pd.DataFrame]]:
+    if partition_column is None:
+        groups: List[Tuple[Any, pd.DataFrame]] = [(None, df)]
+    else:
+        groups = list(df.groupby(partition_column, sort=True, dropna=False))
+
+    for value, frame in groups:
+        prefix = "part" if partition_column is None else _safe_name(value)
+        step = max_rows or max(len(frame), 1)
+        for number, start in enumerate(range(0, max(len(frame), 1), step)):
+            yield f"{prefix}-{number:04d}", _json_value(value), frame.iloc[start : start + step]
+
+
+def _safe_name(value: Any) -> str:
+    if _is_missing(value):
+        return "sin_valor"
+    return re.sub(r"[^\w.-]+", "_", str(value)).strip("._") or "valor"
+
+
+def _unique_sheet_names(labels: Sequence[str]) -> List[str]:
+    names: List[str] = []
+    for label in labels:
+        # Excel limita los nombres de hoja a 31 caracteres, sin []:*?/\.
+        base = re.sub(r"[\[\]:*?/\\]", "_", label)[:31]
+        name, counter = base, 1
+        while name in names:
+            suffix = f"~{counter}"
+            name = base[: 31 - len(suffix)] + suffix
+            counter += 1
+        names.append(name)
+    return names
+
+
+def _write_excel_sheets(
+    target: Path,
+    sheet_names: Sequence[str],
+    parts: Sequence[Tuple[str, Any, pd.DataFrame]],
+) -> None:
+    with pd.ExcelWriter(target, engine="openpyxl") as writer:
+        for sheet_name, (_, _, frame) in zip(sheet_names, parts):
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def _json_value(value: Any) -> Any:
+    if _is_missing(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def write_back_column(
+    df: pd.DataFrame,
+    path: Path,
+    column: str,
+    *,
+    header: Optional[int],
+    rows: Optional[Iterable[Any]] = None,
+) -> None:
+    """Actualiza en el Excel existente sólo las celdas de ``column`` en ``rows``.
+
+    Conserva el formato y el resto de hojas del libro. Si el archivo no existe
+    o no es un ``.xlsx``/``.xlsm``, recurre a ``save_dataframe``.
+    """
+    write_back_columns(df, path, {column: rows}, header=header)
+
+
+def write_back_columns(
+    df: pd.DataFrame,
+    path: Path,
+    updates: Mapping[str, Optional[Iterable[Any]]],
+    *,
+    header: Optional[int],
+) -> None:
+    """Como ``write_back_column`` pero para varias columnas en una sola escritura.
+
+    ``updates`` asocia cada columna con las filas a actualizar (``None`` para
+    todas).
+    """
+    suffix = path.suffix.lower()
+    if not supports_write_back(path):
+        save_dataframe(df, path)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, keep_vba=suffix == ".xlsm")
+    sheet = workbook.worksheets[0]
+    first_row = 1 if header is None else header + 2
+
+    for column, rows in updates.items():
+        column_number = _excel_column_number(sheet, df, column, header=header)
+        values = df[column] if rows is None else df.loc[list(rows), column]
+        positions = df.index.get_indexer(values.index)
+        for position, value in zip(positions, values.tolist()):
+            sheet.cell(
+                row=first_row + int(position),
+                column=column_number,
+                value=None if _is_missing(value) else value,
+            )
+
+    _atomic_write(path, workbook.save)
+
+
+def supports_write_back(path: Path) -> bool:
+    """Indica si ``write_back_columns`` puede actualizar ``path`` sin reescribirlo."""
+    return path.suffix.lower() in {".xlsx", ".xlsm"} and path.exists()
+
+
+def _excel_column_number(sheet, df: pd.DataFrame, column: str, *, header: Optional[int]) -> int:
+    if header is None:
+        # Sin encabezado las columnas del DataFrame siguen el orden de la hoja.
+        return df.columns.get_loc(column) + 1
+    header_row = header + 1
+    for cell in sheet[header_row]:
+        if cell.value == column:
+            return cell.column
+    column_number = sheet.max_column + 1
+    sheet.cell(row=header_row, column=column_number, value=column)
+    return column_number
+
+
+def _is_missing(value: Any) -> bool:
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _atomic_write(path: Path, writer: Callable[[Path], Any]) -> None:
+    descriptor, temp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.stem}.", suffix=path.suffix
+    )
+    os.close(descriptor)
+    temp_path = Path(temp_name)
+    try:
+        writer(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def convert_dataframe_file(source: Path, target: Path, *, header: Optional[int]) -> None:
+    """Convierte un archivo de datos a otro formato (por ejemplo Parquet -> Excel)."""
+    save_dataframe(load_dataframe(source, header=header), target)
 
 
 def ensure_column_exists(
@@ -21,10 +795,53 @@ def ensure_column_exists(
     column: str,
     *,
     default_value=None,
+    dtype: Optional[Any] = None,
 ) -> None:
-    """Asegura que la columna exista en el DataFrame."""
+    """Asegura que la columna exista en el DataFrame.
+
+    Con ``dtype`` la columna se crea (o se convierte, si ya existía) con ese
+    tipo, por ejemplo ``"Int8"`` o ``"category"``, en lugar de ``object``.
+    """
     if column not in df.columns:
-        df[column] = default_value
+        df[column] = pd.Series(default_value, index=df.index, dtype=dtype)
+    elif dtype is not None and df[column].dtype != dtype:
+        df[column] = df[column].astype(dtype)
+
+
+def text_dtype() -> Optional[pd.StringDtype]:
+    """Tipo de texto respaldado por Arrow, o ``None`` si pyarrow no está instalado."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype("pyarrow")
+
+
+def compact_text_columns(df: pd.DataFrame, columns: Iterable[Any]) -> None:
+    """Convierte ``columns`` a texto Arrow (sin cambios si pyarrow no está disponible)."""
+    dtype = text_dtype()
+    if dtype is None:
+        return
+    for column in columns:
+        if column in df.columns and df[column].dtype != dtype:
+            # Los números se convierten a su representación en texto.
+            df[column] = df[column].astype(dtype)
+
+
+def memory_report(df: pd.DataFrame) -> pd.Series:
+    """Bytes ocupados por cada columna (incluido el contenido de los objetos)."""
+    usage = df.memory_usage(deep=True, index=False)
+    return pd.concat([usage, pd.Series({"TOTAL": int(usage.sum())})])
+
+
+def compare_memory(before: pd.Series, after: pd.Series) -> pd.DataFrame:
+    """Tabla ``antes``/``después`` en MB por columna a partir de dos ``memory_report``."""
+    table = pd.DataFrame({"antes_mb": before, "despues_mb": after}).fillna(0) / 1024**2
+    # Una columna que no existía antes (``antes_mb`` 0) no tiene ahorro definido.
+    before_mb = table["antes_mb"].where(table["antes_mb"] > 0)
+    table["ahorro_pct"] = (1 - table["despues_mb"] / before_mb).mul(100)
+    order = [label for label in table.index if label != "TOTAL"] + ["TOTAL"]
+    return table.loc[order].round(3)
 
 
 def rename_numeric_columns(df: pd.DataFrame, mapping: Mapping[int, str]) -> None:
@@ -32,15 +849,3 @@ def rename_numeric_columns(df: pd.DataFrame, mapping: Mapping[int, str]) -> None
     if all(col in df.columns for col in mapping):
         df.rename(columns=mapping, inplace=True)
 
-
-def iter_rows(
-    df: pd.DataFrame,
-    *,
-    skip_rows: int = 0,
-) -> Iterable[tuple[int, pd.Series]]:
-    """Itera sobre las filas del DataFrame aplicando un offset opcional."""
-    for index, row in df.iterrows():
-        if index < skip_rows:
-            continue
-        yield index, row
-
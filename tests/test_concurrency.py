@@ -0,0 +1,40 @@
+import time
+
+from scripts.pipelines.concurrency import DECREASE, AdaptiveLimiter
+
+
+def _feed(limiter: AdaptiveLimiter, latency: float, calls: int) -> None:
+    for _ in range(calls):
+        limiter._observe(time.monotonic(), latency, None)
+
+
+def test_latency_shift_independent_of_load_does_not_pin_limit():
+    limiter = AdaptiveLimiter(initial=5, maximum=50)
+    _feed(limiter, 0.02, 2000)
+    assert limiter.limit == 50
+
+    _feed(limiter, 0.04, 3000)
+
+    assert limiter.limit == 50
+    assert limiter.baseline_p95 > 0.03
+
+
+def test_latency_growing_with_load_still_cuts_limit():
+    limiter = AdaptiveLimiter(initial=5, maximum=50)
+    _feed(limiter, 0.02, 200)
+    limit = limiter.limit
+
+    # Latencia proporcional a las peticiones en vuelo: la reducción sí la baja.
+    for _ in range(2000):
+        limiter._observe(time.monotonic(), 0.02 * max(1, limiter.limit - limit + 1), None)
+
+    assert any(decision["accion"] == DECREASE for decision in limiter.decisions)
+    assert limiter.limit < 50
+
+
+def test_minimum_limit_rebases_latency_baseline():
+    limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+    _feed(limiter, 0.02, 50)
+    _feed(limiter, 0.2, 50)
+
+    assert limiter.baseline_p95 > 0.1